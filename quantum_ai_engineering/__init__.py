@@ -5,6 +5,7 @@ AI-Driven Quantum Software Engineering Framework
 from .code_generator import QuantumCodeGenerator
 from .optimizer import CircuitOptimizer
 from .verifier import CircuitVerifier
+from .instrumentation import Tracer, get_tracer
 
 __version__ = "0.1.0"
 __author__ = "Mohammed Amine Abdelouareth" 
\ No newline at end of file
@@ -0,0 +1,358 @@
+"""
+End-to-end benchmark suite for generation, optimization and verification
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from qiskit import QuantumCircuit
+
+from .code_generator import QuantumCodeGenerator
+from .instrumentation import peak_rss_kb
+from .optimizer import CircuitOptimizer
+from .verifier import CircuitVerifier
+
+CIRCUIT_FAMILIES = ('ghz', 'qft', 'clifford_t', 'cnot_ladder')
+VERIFY_METHODS = CircuitVerifier.VERIFICATION_METHODS
+STAGES = ('generate', 'optimize', 'verify')
+
+# Dense unitaries grow as 4^n, so larger circuits are skipped for that method
+MAX_UNITARY_QUBITS = 10
+
+
+class StubCodeGenerator(QuantumCodeGenerator):
+    """Offline code generator whose "model" echoes the specification back as the program."""
+
+    def _load_tokenizer(self, model_name: str):
+        """Return a pass-through tokenizer."""
+        return lambda spec, **kwargs: {'input_ids': spec}
+
+    def _load_model(self, model_name: str, inference_mode: str):
+        """No model is needed for the offline stub."""
+        return None
+
+    def _decode_batch(self, inputs: Dict, num_beams: int) -> List[str]:
+        """Return the specifications unchanged."""
+        return list(inputs['input_ids'])
+
+
+def ghz_circuit(num_qubits: int) -> QuantumCircuit:
+    """Build an n-qubit GHZ state preparation circuit."""
+    circuit = QuantumCircuit(num_qubits)
+    circuit.h(0)
+    for i in range(num_qubits - 1):
+        circuit.cx(i, i + 1)
+    return circuit
+
+
+def qft_circuit(num_qubits: int) -> QuantumCircuit:
+    """Build an n-qubit quantum Fourier transform from h, cp and swap gates."""
+    circuit = QuantumCircuit(num_qubits)
+    for target in reversed(range(num_qubits)):
+        circuit.h(target)
+        for control in reversed(range(target)):
+            circuit.cp(np.pi / 2 ** (target - control), control, target)
+    for i in range(num_qubits // 2):
+        circuit.swap(i, num_qubits - i - 1)
+    return circuit
+
+
+def clifford_t_circuit(num_qubits: int, num_gates: int, seed: int = 0) -> QuantumCircuit:
+    """Build a random Clifford+T circuit with the given number of gates."""
+    rng = np.random.default_rng(seed)
+    single_qubit_gates = ('h', 's', 'sdg', 't', 'tdg', 'x', 'z')
+    circuit = QuantumCircuit(num_qubits)
+    for _ in range(num_gates):
+        if num_qubits > 1 and rng.random() < 0.3:
+            control, target = rng.choice(num_qubits, size=2, replace=False)
+            circuit.cx(int(control), int(target))
+        else:
+            gate = single_qubit_gates[rng.integers(len(single_qubit_gates))]
+            getattr(circuit, gate)(int(rng.integers(num_qubits)))
+    return circuit
+
+
+def cnot_ladder_circuit(num_qubits: int, num_gates: int) -> QuantumCircuit:
+    """Build a circuit of repeated nearest-neighbour CNOT ladders."""
+    circuit = QuantumCircuit(num_qubits)
+    if num_qubits < 2:
+        return circuit
+    for i in range(num_gates):
+        control = i % (num_qubits - 1)
+        circuit.cx(control, control + 1)
+    return circuit
+
+
+def build_circuit(family: str, num_qubits: int, num_gates: int, seed: int = 0) -> QuantumCircuit:
+    """
+    Build a benchmark circuit.
+
+    Args:
+        family (str): One of CIRCUIT_FAMILIES
+        num_qubits (int): Number of qubits
+        num_gates (int): Gate count, used by the 'clifford_t' and 'cnot_ladder' families
+        seed (int): Random seed for the 'clifford_t' family
+
+    Returns:
+        QuantumCircuit: Benchmark circuit
+    """
+    if family == 'ghz':
+        return ghz_circuit(num_qubits)
+    if family == 'qft':
+        return qft_circuit(num_qubits)
+    if family == 'clifford_t':
+        return clifford_t_circuit(num_qubits, num_gates, seed)
+    if family == 'cnot_ladder':
+        return cnot_ladder_circuit(num_qubits, num_gates)
+    raise ValueError(f"Unknown circuit family: {family}")
+
+
+def ghz_program(num_qubits: int) -> str:
+    """Write a GHZ circuit in the generator's operation syntax."""
+    lines = ['h(target=0)']
+    lines += [f'cnot(control={i}, target={i + 1})' for i in range(num_qubits - 1)]
+    return '\n'.join(lines)
+
+
+def peak_allocated_kb(func: Callable[[], object]) -> Optional[int]:
+    """
+    Call a function once and measure the peak memory it allocates.
+
+    Args:
+        func (Callable): Zero-argument function to measure
+
+    Returns:
+        int: Peak Python and numpy allocations during the call in kilobytes,
+        or None if tracemalloc is already in use elsewhere
+    """
+    if tracemalloc.is_tracing():
+        return None
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak // 1024
+
+
+def time_call(func: Callable[[], object], repeats: int) -> Dict:
+    """
+    Time repeated calls of a function.
+
+    Allocation tracing slows calls down, so memory is measured in one extra,
+    untimed call.
+
+    Args:
+        func (Callable): Zero-argument function to time
+        repeats (int): Number of timed calls
+
+    Returns:
+        Dict: Throughput (calls/s), p50/p99 latency (seconds), the case's peak
+        allocation and the process-wide peak RSS so far
+    """
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    latencies = np.asarray(latencies)
+    total = float(latencies.sum())
+    return {
+        'repeats': repeats,
+        'throughput': repeats / total if total > 0 else float('inf'),
+        'p50': float(np.percentile(latencies, 50)),
+        'p99': float(np.percentile(latencies, 99)),
+        'peak_alloc_kb': peak_allocated_kb(func),
+        # ru_maxrss only grows, so this includes every earlier case
+        'process_peak_rss_kb': peak_rss_kb()
+    }
+
+
+def _with_measurements(circuit: QuantumCircuit) -> QuantumCircuit:
+    """Return a copy of the circuit measuring every qubit."""
+    measured = circuit.copy()
+    measured.measure_all()
+    return measured
+
+
+def _run_case(record: Dict, func: Callable[[], object], repeats: int) -> Dict:
+    """Time one benchmark case, recording failures instead of aborting the run."""
+    try:
+        func()  # warm-up
+        record.update(time_call(func, repeats))
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def run_benchmarks(qubit_counts: List[int], gate_counts: List[int],
+                   families: List[str] = CIRCUIT_FAMILIES,
+                   stages: List[str] = STAGES,
+                   methods: List[str] = VERIFY_METHODS,
+                   repeats: int = 5,
+                   generator: Optional[QuantumCodeGenerator] = None,
+                   seed: int = 0) -> Dict:
+    """
+    Run the benchmark suite.
+
+    Args:
+        qubit_counts (List[int]): Qubit counts to sweep
+        gate_counts (List[int]): Gate counts to sweep for gate-count-driven families
+        families (List[str]): Circuit families to benchmark
+        stages (List[str]): Pipeline stages to benchmark
+        methods (List[str]): CircuitVerifier methods to benchmark
+        repeats (int): Timed repetitions per case
+        generator (QuantumCodeGenerator, optional): Generator to benchmark;
+            defaults to the offline StubCodeGenerator
+        seed (int): Random seed for generated circuits
+
+    Returns:
+        Dict: Run metadata and one record per benchmark case
+    """
+    results = []
+
+    if 'generate' in stages:
+        if generator is None:
+            generator = StubCodeGenerator()
+        for num_qubits in qubit_counts:
+            spec = ghz_program(num_qubits)
+            record = {'stage': 'generate', 'family': 'ghz', 'num_qubits': num_qubits,
+                      'num_gates': num_qubits}
+            results.append(_run_case(record, lambda: generator.generate(spec), repeats))
+
+    optimizer = CircuitOptimizer() if 'optimize' in stages else None
+    verifier = CircuitVerifier() if 'verify' in stages else None
+
+    for family in families:
+        # GHZ and QFT have a fixed gate count per qubit count
+        family_gate_counts = gate_counts if family in ('clifford_t', 'cnot_ladder') else [None]
+        for num_qubits in qubit_counts:
+            for num_gates in family_gate_counts:
+                circuit = build_circuit(family, num_qubits, num_gates or 0, seed)
+                base = {'family': family, 'num_qubits': num_qubits, 'num_gates': len(circuit.data)}
+
+                if optimizer is not None:
+                    record = dict(base, stage='optimize')
+                    results.append(_run_case(record, lambda: optimizer.optimize(circuit), repeats))
+
+                if verifier is None:
+                    continue
+                measured = _with_measurements(circuit)
+                for method in methods:
+                    if method == 'unitary' and num_qubits > MAX_UNITARY_QUBITS:
+                        continue
+                    target = measured if method in ('measurement', 'error_detection') else circuit
+                    record = dict(base, stage='verify', method=method)
+                    results.append(_run_case(
+                        record, lambda: verifier.verify(target, method=method), repeats
+                    ))
+
+    return {
+        'metadata': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeats': repeats,
+            'timestamp': time.time()
+        },
+        'results': results
+    }
+
+
+def _case_key(record: Dict) -> tuple:
+    """Identify a benchmark case independently of its measurements."""
+    return (record['stage'], record.get('method'), record['family'],
+            record['num_qubits'], record['num_gates'])
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, threshold: float = 0.2) -> List[Dict]:
+    """
+    Flag cases whose p50 latency regressed against a saved baseline.
+
+    A case that was timed in the baseline but now fails counts as a regression.
+
+    Args:
+        report (Dict): Output of run_benchmarks
+        baseline (Dict): Previously saved output of run_benchmarks
+        threshold (float): Allowed relative slowdown before a case is flagged
+
+    Returns:
+        List[Dict]: One entry per regressed case
+    """
+    baseline_cases = {_case_key(r): r for r in baseline['results'] if 'p50' in r}
+    regressions = []
+    for record in report['results']:
+        previous = baseline_cases.get(_case_key(record))
+        if previous is None:
+            continue
+        if 'p50' not in record:
+            regressions.append({
+                'case': _case_key(record),
+                'baseline_p50': previous['p50'],
+                'error': record.get('error')
+            })
+            continue
+        ratio = record['p50'] / previous['p50'] if previous['p50'] > 0 else float('inf')
+        if ratio > 1 + threshold:
+            regressions.append({
+                'case': _case_key(record),
+                'baseline_p50': previous['p50'],
+                'p50': record['p50'],
+                'slowdown': ratio
+            })
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point for the benchmark suite."""
+    parser = argparse.ArgumentParser(description="Benchmark generate/optimize/verify")
+    parser.add_argument('--qubits', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--gates', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--families', nargs='+', choices=CIRCUIT_FAMILIES, default=list(CIRCUIT_FAMILIES))
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--methods', nargs='+', choices=VERIFY_METHODS, default=list(VERIFY_METHODS))
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--model', default=None,
+                        help="benchmark a real model instead of the offline stub")
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--baseline', default=None, help="saved report to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    generator = QuantumCodeGenerator(args.model) if args.model else None
+    report = run_benchmarks(args.qubits, args.gates, args.families, args.stages,
+                            args.methods, args.repeats, generator, args.seed)
+
+    with open(args.output, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, indent=2)
+
+    for record in report['results']:
+        name = '/'.join(str(part) for part in _case_key(record) if part is not None)
+        if 'error' in record:
+            print(f"{name}: ERROR {record['error']}")
+        else:
+            print(f"{name}: p50={record['p50'] * 1e3:.3f}ms p99={record['p99'] * 1e3:.3f}ms "
+                  f"throughput={record['throughput']:.1f}/s")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as fh:
+            baseline = json.load(fh)
+        regressions = compare_to_baseline(report, baseline, args.threshold)
+        for regression in regressions:
+            if 'error' in regression:
+                print(f"REGRESSION {regression['case']}: now fails ({regression['error']})")
+            else:
+                print(f"REGRESSION {regression['case']}: {regression['slowdown']:.2f}x slower")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
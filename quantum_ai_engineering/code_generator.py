@@ -5,17 +5,65 @@ Quantum code generation module
 import numpy as np
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
+from qiskit.circuit import Parameter
 from qiskit.circuit.library import QFT, PhaseEstimation
+from typing import Dict, List, Optional
 import torch
+import time
 import re
 
+from .instrumentation import Tracer, attach_trace, get_tracer
+
 class QuantumCodeGenerator:
     """AI-powered quantum code generator that translates natural language to quantum circuits."""
     
-    def __init__(self, model_name="t5-base"):
-        """Initialize the code generator with a pre-trained language model."""
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    INFERENCE_MODES = ('default', 'quantized', 'onnx')
+    DECODING_STRATEGIES = ('beam', 'greedy_first')
+    # Operation arguments that take an angle rather than a qubit index
+    ANGLE_ARGUMENTS = ('angle',)
+    # Arguments each operation needs to be applied
+    REQUIRED_ARGUMENTS = {
+        'h': ('target',),
+        'x': ('target',),
+        'y': ('target',),
+        'z': ('target',),
+        'cnot': ('control', 'target'),
+        'swap': ('qubit1', 'qubit2'),
+        'phase': ('target', 'angle'),
+        'measure': ('qubit', 'bit')
+    }
+    
+    def __init__(self, model_name="t5-base", inference_mode: str = 'default',
+                 decoding: str = 'beam', num_beams: int = 4,
+                 tracer: Optional[Tracer] = None):
+        """
+        Initialize the code generator with a pre-trained language model.
+        
+        Args:
+            model_name (str): Hugging Face model identifier
+            inference_mode (str): 'default' (fp32), 'quantized' (dynamic int8
+                quantization of the linear layers, for CPU nodes) or 'onnx'
+                (ONNX Runtime export with encoder/decoder KV-cache reuse,
+                requires ``optimum[onnxruntime]``)
+            decoding (str): 'beam' always runs beam search; 'greedy_first' runs
+                greedy decoding and falls back to beam search only when the
+                output does not parse into a valid program
+            num_beams (int): Beam width used for beam search
+            tracer (Tracer, optional): Instrumentation sink; defaults to the
+                process-wide tracer, which is disabled unless enabled
+        """
+        if inference_mode not in self.INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode: {inference_mode}")
+        if decoding not in self.DECODING_STRATEGIES:
+            raise ValueError(f"Unknown decoding strategy: {decoding}")
+        
+        self.inference_mode = inference_mode
+        self.decoding = decoding
+        self.num_beams = num_beams
+        self.tracer = tracer if tracer is not None else get_tracer()
+        self.tokenizer = self._load_tokenizer(model_name)
+        self.model = self._load_model(model_name, inference_mode)
+        self.reset_metrics()
         self.quantum_operations = {
             'h': self._hadamard,
             'x': self._pauli_x,
@@ -37,35 +85,192 @@ class QuantumCodeGenerator:
         Returns:
             QuantumCircuit: Generated quantum circuit
         """
-        # Parse the specification
-        operations = self._parse_specification(specification)
+        with self.tracer.span('generate') as span:
+            # Parse the specification
+            operations = self._parse_specification(specification)
+            qc = self._build_circuit(operations)
+            
+        return attach_trace(qc, span)
+    
+    def generate_batch(self, specifications: List[str],
+                       return_exceptions: bool = False) -> List[QuantumCircuit]:
+        """
+        Generate quantum circuits for several specifications in one model call.
         
-        # Create quantum circuit
-        num_qubits = self._determine_num_qubits(operations)
-        qc = QuantumCircuit(num_qubits)
+        Args:
+            specifications (List[str]): Natural language descriptions
+            return_exceptions (bool): Return the exception for a specification
+                that cannot be turned into a circuit in its place, instead of
+                failing the whole batch
+            
+        Returns:
+            List[QuantumCircuit]: Generated circuits, in input order
+        """
+        with self.tracer.span('generate_batch', batch_size=len(specifications)) as span:
+            circuits = []
+            for operations in self._parse_specifications(specifications):
+                try:
+                    if isinstance(operations, Exception):
+                        raise operations
+                    circuits.append(self._build_circuit(operations))
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    circuits.append(e)
         
-        # Apply operations
-        for op in operations:
-            self._apply_operation(qc, op)
+        return [qc if isinstance(qc, Exception) else attach_trace(qc, span) for qc in circuits]
+    
+    def get_metrics(self) -> Dict:
+        """
+        Return inference latency and parse-success metrics.
+        
+        Returns:
+            Dict: Counters accumulated since the last reset, plus derived
+            mean latency (seconds) and parse-success rate
+        """
+        metrics = dict(self.metrics)
+        requests = metrics['requests']
+        metrics['inference_mode'] = self.inference_mode
+        metrics['decoding'] = self.decoding
+        metrics['mean_latency'] = metrics['total_latency'] / requests if requests else 0.0
+        metrics['parse_success_rate'] = metrics['parse_successes'] / requests if requests else 0.0
+        return metrics
+    
+    def reset_metrics(self):
+        """Reset the inference metrics."""
+        self.metrics = {
+            'requests': 0,
+            'total_latency': 0.0,
+            'last_latency': 0.0,
+            'parse_successes': 0,
+            'beam_fallbacks': 0
+        }
+    
+    def _load_tokenizer(self, model_name: str):
+        """Load the tokenizer matching the model."""
+        return AutoTokenizer.from_pretrained(model_name)
+    
+    def _load_model(self, model_name: str, inference_mode: str):
+        """Load the sequence-to-sequence model for the selected inference mode."""
+        if inference_mode == 'onnx':
+            try:
+                from optimum.onnxruntime import ORTModelForSeq2SeqLM
+            except ImportError as e:
+                raise ImportError(
+                    "inference_mode='onnx' requires optimum[onnxruntime]"
+                ) from e
+            return ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, use_cache=True)
+        
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+        model.eval()
+        if inference_mode == 'quantized':
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        return model
+    
+    def _build_circuit(self, operations: list) -> QuantumCircuit:
+        """Build a circuit from a parsed operation list."""
+        with self.tracer.span('build_circuit', num_operations=len(operations)):
+            # Create quantum circuit
+            num_qubits = self._determine_num_qubits(operations)
+            qc = QuantumCircuit(num_qubits)
             
+            # Apply operations
+            for op in operations:
+                self._apply_operation(qc, op)
         return qc
     
     def _parse_specification(self, spec: str) -> list:
         """Parse natural language specification into quantum operations."""
-        # Tokenize and encode the specification
-        inputs = self.tokenizer(spec, return_tensors="pt", max_length=512, truncation=True)
+        operations = self._parse_specifications([spec])[0]
+        if isinstance(operations, Exception):
+            raise operations
+        return operations
+    
+    def _parse_specifications(self, specs: List[str]) -> List[list]:
+        """
+        Parse a batch of specifications into operation lists with one model call per decoding pass.
         
-        # Generate operation sequence
-        outputs = self.model.generate(
-            inputs["input_ids"],
-            max_length=128,
-            num_beams=4,
-            early_stopping=True
+        A program that fails to parse is returned as its ValueError, so one
+        malformed program does not fail the rest of the batch.
+        """
+        start = time.perf_counter()
+        parsed = [False] * len(specs)
+        programs = [None] * len(specs)
+        try:
+            pending = list(range(len(specs)))
+            
+            if self.decoding == 'greedy_first':
+                decoded = self._decode_specifications(specs, num_beams=1)
+                with self.tracer.span('parse_operations'):
+                    for i, text in enumerate(decoded):
+                        programs[i] = self._try_parse_operations(text)
+                        parsed[i] = programs[i] is not None
+                pending = [i for i in pending if not parsed[i]]
+                if pending:
+                    self.metrics['beam_fallbacks'] += len(pending)
+                    self.tracer.count('generator_beam_fallbacks_total', len(pending))
+            
+            if pending:
+                decoded = self._decode_specifications([specs[i] for i in pending], self.num_beams)
+                with self.tracer.span('parse_operations'):
+                    for i, text in zip(pending, decoded):
+                        try:
+                            programs[i] = self._parse_operations(text)
+                        except ValueError as e:
+                            programs[i] = e
+                            continue
+                        parsed[i] = self._is_valid_program(programs[i])
+            return programs
+        finally:
+            latency = time.perf_counter() - start
+            successes = sum(parsed)
+            self.tracer.count('generator_requests_total', successes, parsed='true')
+            self.tracer.count('generator_requests_total', len(specs) - successes, parsed='false')
+            # Every request in a batch waits for the whole batch
+            self.metrics['requests'] += len(specs)
+            self.metrics['total_latency'] += latency * len(specs)
+            self.metrics['last_latency'] = latency
+            self.metrics['parse_successes'] += successes
+    
+    def _decode_specifications(self, specs: List[str], num_beams: int) -> List[str]:
+        """Tokenize a batch of specifications and decode the model output."""
+        # Tokenize and encode the specifications
+        with self.tracer.span('tokenize', batch_size=len(specs)):
+            inputs = self.tokenizer(specs, return_tensors="pt", max_length=512,
+                                    truncation=True, padding=True)
+        with self.tracer.span('decode', num_beams=num_beams, batch_size=len(specs)):
+            return self._decode_batch(inputs, num_beams)
+    
+    def _decode_batch(self, inputs: Dict, num_beams: int) -> List[str]:
+        """Run the model on encoded inputs and decode the best sequence for each."""
+        with torch.inference_mode():
+            outputs = self.model.generate(
+                inputs["input_ids"],
+                attention_mask=inputs.get("attention_mask"),
+                max_length=128,
+                num_beams=num_beams,
+                early_stopping=num_beams > 1,
+                use_cache=True
+            )
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+    
+    def _try_parse_operations(self, decoded: str) -> Optional[List[Dict]]:
+        """Parse decoded text, returning None unless it yields a valid program."""
+        try:
+            operations = self._parse_operations(decoded)
+        except ValueError:
+            return None
+        return operations if self._is_valid_program(operations) else None
+    
+    def _is_valid_program(self, operations: List[Dict]) -> bool:
+        """Check that an operation list is non-empty and uses only known, fully specified operations."""
+        return bool(operations) and all(
+            op.get('type') in self.quantum_operations
+            and all(key in op for key in self.REQUIRED_ARGUMENTS.get(op['type'], ()))
+            for op in operations
         )
-        
-        # Decode and parse operations
-        decoded = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-        return self._parse_operations(decoded)
     
     def _determine_num_qubits(self, operations: list) -> int:
         """Determine the number of qubits needed for the circuit."""
@@ -117,9 +322,25 @@ class QuantumCodeGenerator:
         """Apply measurement."""
         qc.measure(op['qubit'], op['bit'])
     
+    def _parse_angle(self, value: str, parameters: Dict[str, Parameter]):
+        """Parse an angle argument as a number, ``pi`` or a named symbolic parameter."""
+        try:
+            return float(value)
+        except ValueError:
+            pass
+        if value == 'pi':
+            return np.pi
+        if not re.fullmatch(r'[A-Za-z_]\w*', value):
+            raise ValueError(f"Invalid angle: {value}")
+        # Parameters sharing a name must be the same object within one circuit
+        if value not in parameters:
+            parameters[value] = Parameter(value)
+        return parameters[value]
+    
     def _parse_operations(self, decoded: str) -> list:
         """Parse decoded text into operation list."""
         operations = []
+        parameters = {}
         lines = decoded.split('\n')
         
         for line in lines:
@@ -136,7 +357,11 @@ class QuantumCodeGenerator:
                 param_dict = {}
                 for param in params.split(','):
                     key, value = param.split('=')
-                    param_dict[key.strip()] = int(value.strip())
+                    key, value = key.strip(), value.strip()
+                    if key in self.ANGLE_ARGUMENTS:
+                        param_dict[key] = self._parse_angle(value, parameters)
+                    else:
+                        param_dict[key] = int(value)
                 
                 operations.append({
                     'type': op_type,
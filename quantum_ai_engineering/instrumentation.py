@@ -0,0 +1,272 @@
+"""
+Low-overhead instrumentation for the generation, optimization and verification pipeline
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, IO, List, Optional, Tuple, Union
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+
+def peak_rss_kb() -> Optional[int]:
+    """Return the peak resident set size of this process in kilobytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class Span:
+    """A timed, nestable section of work."""
+
+    __slots__ = ('name', 'attributes', 'children', 'start', 'end', '_tracer')
+
+    def __init__(self, tracer: 'Tracer', name: str, attributes: Dict):
+        self._tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.children = []
+        self.start = 0.0
+        self.end = 0.0
+
+    @property
+    def duration(self) -> float:
+        """Span duration in seconds."""
+        return self.end - self.start
+
+    def set(self, key: str, value):
+        """Attach an attribute to the span."""
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict:
+        """Convert the span and its children to a JSON-serializable dict."""
+        return {
+            'name': self.name,
+            'start': self.start,
+            'duration': self.duration,
+            'attributes': dict(self.attributes),
+            'children': [child.to_dict() for child in self.children]
+        }
+
+    def __enter__(self) -> 'Span':
+        self._tracer._push(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self._tracer._pop(self)
+        return False
+
+
+class _NullSpan:
+    """Shared no-op span returned while tracing is disabled."""
+
+    __slots__ = ()
+
+    def set(self, key: str, value):
+        pass
+
+    def to_dict(self) -> Optional[Dict]:
+        return None
+
+    def __enter__(self) -> '_NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Collects nested timing spans, counters and memory high-water marks."""
+
+    def __init__(self, enabled: bool = True, max_spans: int = 10000):
+        """
+        Initialize the tracer.
+
+        Args:
+            enabled (bool): Whether spans and counters are recorded; a disabled
+                tracer hands out a shared no-op span and ignores counters
+            max_spans (int): Number of finished top-level spans kept for export
+        """
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self.counters = {}
+        self.gauges = {}
+        self.span_totals = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        """Start recording."""
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording."""
+        self.enabled = False
+
+    def reset(self):
+        """Discard everything recorded so far."""
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+            self.gauges.clear()
+            self.span_totals.clear()
+
+    def span(self, name: str, **attributes) -> Union[Span, _NullSpan]:
+        """
+        Open a timing span, nested under the current span of this thread.
+
+        Args:
+            name (str): Span name
+            **attributes: Initial span attributes
+
+        Returns:
+            Span: Context manager timing the enclosed block
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attributes)
+
+    def add_span(self, name: str, duration: float, **attributes):
+        """Record an already-measured span as a child of the current span."""
+        if not self.enabled:
+            return
+        span = Span(self, name, attributes)
+        span.end = time.perf_counter()
+        span.start = span.end - duration
+        self._finish(span, self._stack()[-1] if self._stack() else None)
+
+    def count(self, name: str, value: float = 1, **labels):
+        """Increment a counter, optionally qualified by labels."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge_max(self, name: str, value: float):
+        """Record a high-water mark, keeping the largest value seen."""
+        if not self.enabled or value is None:
+            return
+        with self._lock:
+            if value > self.gauges.get(name, value - 1):
+                self.gauges[name] = value
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _push(self, span: Span):
+        self._stack().append(span)
+
+    def _pop(self, span: Span):
+        stack = self._stack()
+        stack.pop()
+        self._finish(span, stack[-1] if stack else None)
+
+    def _finish(self, span: Span, parent: Optional[Span]):
+        with self._lock:
+            totals = self.span_totals.setdefault(span.name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += span.duration
+        if parent is not None:
+            parent.children.append(span)
+            return
+        # Memory is sampled once per top-level span to keep nested spans cheap
+        rss = peak_rss_kb()
+        span.attributes['peak_rss_kb'] = rss
+        self.gauge_max('peak_rss_kb', rss)
+        self.spans.append(span)
+
+    def export_jsonl(self, target: Union[str, IO]):
+        """
+        Write finished top-level spans, counters and gauges as JSON lines.
+
+        Args:
+            target (str or file): Path or writable text file
+        """
+        if isinstance(target, str):
+            with open(target, 'a', encoding='utf-8') as fh:
+                self.export_jsonl(fh)
+            return
+        for span in list(self.spans):
+            target.write(json.dumps({'type': 'span', **span.to_dict()}, default=str) + '\n')
+        for (name, labels), value in self._sorted_counters():
+            target.write(json.dumps({'type': 'counter', 'name': name,
+                                     'labels': dict(labels), 'value': value}) + '\n')
+        for name, value in sorted(self.gauges.items()):
+            target.write(json.dumps({'type': 'gauge', 'name': name, 'value': value}) + '\n')
+
+    def prometheus_text(self, prefix: str = 'quantum_ai') -> str:
+        """
+        Render a Prometheus text-format snapshot of counters, gauges and span timings.
+
+        Args:
+            prefix (str): Metric name prefix
+
+        Returns:
+            str: Snapshot in the Prometheus exposition format
+        """
+        lines = []
+        seen = set()
+        for (name, labels), value in self._sorted_counters():
+            metric = f'{prefix}_{name}'
+            if metric not in seen:
+                lines.append(f'# TYPE {metric} counter')
+                seen.add(metric)
+            lines.append(f'{metric}{_format_labels(labels)} {value}')
+        for name, value in sorted(self.gauges.items()):
+            lines.append(f'# TYPE {prefix}_{name} gauge')
+            lines.append(f'{prefix}_{name} {value}')
+        if self.span_totals:
+            metric = f'{prefix}_span_seconds'
+            lines.append(f'# TYPE {metric} summary')
+            for name, (count, total) in sorted(self.span_totals.items()):
+                labels = _format_labels((('span', name),))
+                lines.append(f'{metric}_count{labels} {count}')
+                lines.append(f'{metric}_sum{labels} {total}')
+        return '\n'.join(lines) + '\n'
+
+    def _sorted_counters(self) -> List[Tuple[Tuple[str, tuple], float]]:
+        with self._lock:
+            return sorted(self.counters.items())
+
+
+def _format_labels(labels: tuple) -> str:
+    """Format label pairs for the Prometheus exposition format."""
+    if not labels:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"') for _, v in labels)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+
+
+_default_tracer = Tracer(enabled=False)
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer, which is disabled until enabled."""
+    return _default_tracer
+
+
+def attach_trace(circuit, span: Union[Span, _NullSpan]):
+    """Attach a finished span to a circuit's metadata."""
+    trace = span.to_dict()
+    if trace is not None:
+        circuit.metadata = {**(circuit.metadata or {}), 'trace': trace}
+    return circuit
@@ -3,7 +3,7 @@ Quantum circuit optimization module
 """
 
 import numpy as np
-from qiskit import QuantumCircuit
+from qiskit import QuantumCircuit, ClassicalRegister
 from qiskit.transpiler import PassManager
 from qiskit.transpiler.passes import (
     Optimize1qGates,
@@ -13,14 +13,44 @@ from qiskit.transpiler.passes import (
     RemoveDiagonalGatesBeforeMeasure
 )
 from qiskit.quantum_info import Operator
+from qiskit.circuit import ParameterExpression
+from qiskit.circuit.library import PhaseGate, RXGate, RYGate, RZGate, U1Gate
 import networkx as nx
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
+
+from .instrumentation import Tracer, attach_trace, get_tracer
 
 class CircuitOptimizer:
     """AI-powered quantum circuit optimizer that reduces circuit depth and gate count."""
     
-    def __init__(self):
-        """Initialize the circuit optimizer with optimization passes."""
+    # Rotations whose consecutive applications add their angles, with the
+    # gate class used to rebuild a merged rotation
+    ADDITIVE_ROTATIONS = {'p': PhaseGate, 'u1': U1Gate, 'rz': RZGate, 'rx': RXGate, 'ry': RYGate}
+    # Gates that cancel when applied twice in a row
+    SELF_INVERSE_GATES = ('h', 'x', 'y', 'z', 'cx', 'cz', 'swap')
+    # Gates diagonal in the computational basis on every qubit they act on
+    DIAGONAL_GATES = ('id', 'z', 's', 'sdg', 't', 'tdg', 'p', 'u1', 'rz',
+                      'cz', 'cp', 'cu1', 'crz', 'rzz')
+    # Single-qubit gates diagonal in the X basis, which commute with a CNOT target
+    X_BASIS_GATES = ('x', 'rx', 'sx', 'sxdg')
+    SCHEDULE_METHODS = ('asap', 'alap')
+    
+    def __init__(self, tracer: Optional[Tracer] = None, schedule: Optional[str] = 'alap'):
+        """
+        Initialize the circuit optimizer with optimization passes.
+        
+        Args:
+            tracer (Tracer, optional): Instrumentation sink; defaults to the
+                process-wide tracer, which is disabled unless enabled
+            schedule (str, optional): Layer scheduling applied after the
+                optimization passes, 'alap' (the default, never deeper than
+                'asap') or 'asap'; None disables it
+        """
+        if schedule is not None and schedule not in self.SCHEDULE_METHODS:
+            raise ValueError(f"Unknown schedule method: {schedule}")
+        self.schedule = schedule
+        self.last_schedule = None
+        self.tracer = tracer if tracer is not None else get_tracer()
         self.optimization_rules = []
         self.initialize_rules()
         self.pass_manager = PassManager([
@@ -30,6 +60,12 @@ class CircuitOptimizer:
             RemoveResetInZeroState(),
             RemoveDiagonalGatesBeforeMeasure()
         ])
+        # Passes that stay valid when gate angles are unbound parameters
+        self.symbolic_pass_manager = PassManager([
+            CXCancellation(),
+            RemoveResetInZeroState(),
+            RemoveDiagonalGatesBeforeMeasure()
+        ])
     
     def initialize_rules(self):
         """Initialize optimization rules"""
@@ -40,20 +76,203 @@ class CircuitOptimizer:
         """
         Optimize a quantum circuit to reduce depth and gate count.
         
+        Parameterized circuits are optimized structurally with their angles
+        left symbolic, so the result can be bound to many parameter values
+        (see ``CircuitVerifier.evaluate_parameter_sweep``).
+        
         Args:
             circuit (QuantumCircuit): Input quantum circuit
             
         Returns:
             QuantumCircuit: Optimized quantum circuit
         """
-        # Apply standard optimization passes
-        optimized = self.pass_manager.run(circuit)
+        if not isinstance(circuit, QuantumCircuit):
+            raise ValueError("optimize expects a QuantumCircuit")
         
-        # Apply AI-based optimizations
-        optimized = self._optimize_gate_sequence(optimized)
-        optimized = self._optimize_qubit_mapping(optimized)
+        with self.tracer.span('optimize', num_gates=len(circuit.data)) as span:
+            # Apply standard optimization passes
+            optimized = self._run_pass_manager(circuit)
+            
+            # Apply AI-based optimizations
+            with self.tracer.span('gate_sequence'):
+                num_gates = len(optimized.data)
+                optimized = self._optimize_gate_sequence(optimized)
+                self.tracer.count('optimizer_gates_removed_total', num_gates - len(optimized.data),
+                                  stage='gate_sequence')
+            with self.tracer.span('qubit_mapping'):
+                optimized = self._optimize_qubit_mapping(optimized)
+            if self.schedule is not None:
+                with self.tracer.span('schedule', method=self.schedule) as schedule_span:
+                    optimized, self.last_schedule = self.schedule_layers(optimized, self.schedule)
+                    schedule_span.set('depth_before', self.last_schedule['depth_before'])
+                    schedule_span.set('depth_after', self.last_schedule['depth_after'])
+                optimized.metadata = {**(optimized.metadata or {}), 'schedule': self.last_schedule}
+            span.set('optimized_gates', len(optimized.data))
         
-        return optimized
+        return attach_trace(optimized, span)
+    
+    def optimize_batch(self, circuits: List[QuantumCircuit]) -> List[QuantumCircuit]:
+        """
+        Optimize several circuits.
+        
+        Args:
+            circuits (List[QuantumCircuit]): Input circuits, e.g. a batch from
+                ``CircuitCorpus.iter_batches``
+            
+        Returns:
+            List[QuantumCircuit]: Optimized circuits, in input order
+        """
+        with self.tracer.span('optimize_batch', batch_size=len(circuits)):
+            return [self.optimize(circuit) for circuit in circuits]
+    
+    def _run_pass_manager(self, circuit: QuantumCircuit) -> QuantumCircuit:
+        """Run the standard passes, recording per-pass timings and gate removals when tracing."""
+        pass_manager = self.symbolic_pass_manager if circuit.parameters else self.pass_manager
+        if not self.tracer.enabled:
+            return pass_manager.run(circuit)
+        
+        sizes = [len(circuit.data)]
+        
+        def record_pass(pass_, dag, time, **kwargs):
+            name = type(pass_).__name__
+            self.tracer.add_span(name, time)
+            self.tracer.count('optimizer_gates_removed_total', sizes[-1] - dag.size(), stage=name)
+            sizes.append(dag.size())
+        
+        with self.tracer.span('pass_manager'):
+            return pass_manager.run(circuit, callback=record_pass)
+    
+    def schedule_layers(self, circuit: QuantumCircuit, method: str = 'alap') -> Tuple[QuantumCircuit, Dict]:
+        """
+        Reorder a circuit into fewer layers using gate commutation.
+        
+        Two gates may swap when, on every qubit they share, both are diagonal
+        in the same basis: Z-diagonal gates (z, s, t, p, rz, cz, ...) commute
+        with each other and with a CNOT control, and X-diagonal gates (x, rx,
+        sx) commute with a CNOT target. Gates are layered as soon as (ASAP) or
+        as late as (ALAP) their dependencies allow, in time linear in the
+        number of gates, and re-emitted layer by layer. ALAP is computed from the
+        ASAP order and never has more layers, so it is usually the shallower
+        of the two; neither is guaranteed to reach the minimum depth.
+        
+        Args:
+            circuit (QuantumCircuit): Circuit to schedule
+            method (str): 'asap' or 'alap'
+            
+        Returns:
+            Tuple[QuantumCircuit, Dict]: Scheduled circuit, and a report with the
+            depth before and after scheduling and the number of layers
+        """
+        if method not in self.SCHEDULE_METHODS:
+            raise ValueError(f"Unknown schedule method: {method}")
+        
+        instructions = list(circuit.data)
+        wires = {bit: i for i, bit in enumerate(circuit.qubits)}
+        wires.update({bit: len(wires) + i for i, bit in enumerate(circuit.clbits)})
+        
+        levels = self._layer_levels(instructions, wires)
+        layers = self._bucket_layers(instructions, levels)
+        if method == 'alap':
+            # ALAP is ASAP on the reversed ASAP order, mirrored; starting from
+            # the ASAP order guarantees no more layers than ASAP
+            ordered = [instruction for layer in layers for instruction in layer][::-1]
+            reversed_levels = self._layer_levels(ordered, wires)
+            num_layers = max(reversed_levels, default=0)
+            levels = [num_layers + 1 - level for level in reversed_levels]
+            layers = self._bucket_layers(ordered, levels)
+            # Buckets were filled in reversed order
+            layers = [layer[::-1] for layer in layers]
+        num_layers = len(layers) - 1
+        
+        scheduled = QuantumCircuit(*circuit.qregs, *circuit.cregs, name=circuit.name,
+                                   global_phase=circuit.global_phase)
+        for layer in layers:
+            for instruction, qargs, cargs in layer:
+                scheduled._append(instruction, qargs, cargs)
+        
+        report = {
+            'method': method,
+            'depth_before': circuit.depth(),
+            'depth_after': scheduled.depth(),
+            'layers': num_layers
+        }
+        return scheduled, report
+    
+    def _bucket_layers(self, instructions: List, levels: List[int]) -> List[List]:
+        """Group instructions by layer, keeping their relative order within a layer."""
+        layers = [[] for _ in range(max(levels, default=0) + 1)]
+        for instruction, level in zip(instructions, levels):
+            layers[level].append(instruction)
+        return layers
+    
+    def _commutation_roles(self, instruction, num_qubits: int) -> List[int]:
+        """Return per-qubit commutation roles: 1 for Z-diagonal, 2 for X-diagonal, 0 for none."""
+        if getattr(instruction, 'condition', None) is not None:
+            return [0] * num_qubits
+        name = instruction.name
+        if name in self.DIAGONAL_GATES:
+            return [1] * num_qubits
+        if name in self.X_BASIS_GATES:
+            return [2]
+        if name == 'cx':
+            return [1, 2]
+        return [0] * num_qubits
+    
+    def _condition_bits(self, instruction) -> List:
+        """Return the classical bits a conditional instruction reads."""
+        condition = getattr(instruction, 'condition', None)
+        if condition is None:
+            return []
+        target = condition[0]
+        return list(target) if isinstance(target, ClassicalRegister) else [target]
+    
+    def _layer_levels(self, instructions: List, wires: Dict) -> List[int]:
+        """Assign each instruction the earliest layer (from 1) its dependencies allow."""
+        num_wires = len(wires)
+        # Per-wire frontier: commutation role of the wire's current group of
+        # mutually commuting gates, the layer the group must follow, the
+        # highest layer used on the wire, the layers the group occupies and
+        # the lowest layer above the group's base that is still free
+        kind = [0] * num_wires
+        base = [0] * num_wires
+        top = [0] * num_wires
+        used = [set() for _ in range(num_wires)]
+        next_free = [1] * num_wires
+        
+        levels = []
+        for instruction, qargs, cargs in instructions:
+            qubit_wires = [wires[q] for q in qargs]
+            roles = self._commutation_roles(instruction, len(qubit_wires))
+            operands = list(zip(qubit_wires, roles)) + [(wires[c], 0) for c in cargs]
+            operands += [(wires[c], 0) for c in self._condition_bits(instruction)
+                         if c not in cargs]
+            
+            joins = [role != 0 and kind[w] == role for w, role in operands]
+            level = 1 + max(base[w] if join else top[w] for (w, _), join in zip(operands, joins))
+            
+            # A wire holds one gate per layer, even within a commuting group
+            while True:
+                clash = next((w for (w, _), join in zip(operands, joins)
+                              if join and level in used[w]), None)
+                if clash is None:
+                    break
+                level = next_free[clash] if level < next_free[clash] else top[clash] + 1
+            
+            for (w, role), join in zip(operands, joins):
+                if join:
+                    used[w].add(level)
+                    top[w] = max(top[w], level)
+                else:
+                    kind[w] = role
+                    base[w] = top[w]
+                    top[w] = level
+                    used[w] = {level}
+                    next_free[w] = base[w] + 1
+                while next_free[w] in used[w]:
+                    next_free[w] += 1
+            levels.append(level)
+        
+        return levels
     
     def _optimize_gate_sequence(self, circuit: QuantumCircuit) -> QuantumCircuit:
         """Optimize gate sequence using AI-based pattern matching."""
@@ -67,18 +286,21 @@ class CircuitOptimizer:
         optimized_sequence = self._apply_pattern_optimizations(gate_sequence, patterns)
         
         # Convert back to circuit
-        return self._sequence_to_circuit(optimized_sequence, circuit.num_qubits)
+        return self._sequence_to_circuit(optimized_sequence, circuit)
     
     def _optimize_qubit_mapping(self, circuit: QuantumCircuit) -> QuantumCircuit:
         """Optimize qubit mapping to reduce cross-talk and improve fidelity."""
         # Create interaction graph
-        interaction_graph = self._create_interaction_graph(circuit)
+        with self.tracer.span('interaction_graph'):
+            interaction_graph = self._create_interaction_graph(circuit)
         
         # Find optimal qubit mapping
-        mapping = self._find_optimal_mapping(interaction_graph)
+        with self.tracer.span('spectral_clustering', num_qubits=circuit.num_qubits):
+            mapping = self._find_optimal_mapping(interaction_graph)
         
         # Apply mapping
-        return self._apply_qubit_mapping(circuit, mapping)
+        with self.tracer.span('apply_mapping'):
+            return self._apply_qubit_mapping(circuit, mapping)
     
     def _circuit_to_sequence(self, circuit: QuantumCircuit) -> List[Dict]:
         """Convert circuit to sequence of gate operations."""
@@ -87,40 +309,63 @@ class CircuitOptimizer:
             sequence.append({
                 'gate': instruction.name,
                 'qubits': [q.index for q in qargs],
-                'params': instruction.params
+                'clbits': [c.index for c in cargs],
+                'params': instruction.params,
+                'condition': getattr(instruction, 'condition', None),
+                # Re-emitted as is unless a pattern replaces it
+                'instruction': instruction
             })
         return sequence
     
-    def _sequence_to_circuit(self, sequence: List[Dict], num_qubits: int) -> QuantumCircuit:
-        """Convert sequence of operations back to circuit."""
-        circuit = QuantumCircuit(num_qubits)
+    def _sequence_to_circuit(self, sequence: List[Dict], template: QuantumCircuit) -> QuantumCircuit:
+        """Convert sequence of operations back to a circuit with the template's registers."""
+        circuit = template.copy_empty_like()
         for op in sequence:
-            gate = getattr(circuit, op['gate'])
-            if op['params']:
-                gate(*op['params'], *op['qubits'])
-            else:
-                gate(*op['qubits'])
+            instruction = op.get('instruction')
+            if instruction is None:
+                instruction = self.ADDITIVE_ROTATIONS[op['gate']](*op['params'])
+            circuit.append(instruction, op['qubits'], op['clbits'])
         return circuit
     
+    def _apply_pattern_optimizations(self, sequence: List[Dict],
+                                     patterns: List[Tuple[List[Dict], List[Dict]]]) -> List[Dict]:
+        """Replace matched gate pairs, skipping matches that overlap an earlier one."""
+        replacements = {id(original[0]): (original[1], replacement)
+                        for original, replacement in patterns}
+        optimized = []
+        i = 0
+        while i < len(sequence):
+            match = replacements.get(id(sequence[i]))
+            if match is not None and i + 1 < len(sequence) and sequence[i + 1] is match[0]:
+                optimized.extend(match[1])
+                i += 2
+            else:
+                optimized.append(sequence[i])
+                i += 1
+        return optimized
+    
     def _find_optimization_patterns(self, sequence: List[Dict]) -> List[Tuple[List[Dict], List[Dict]]]:
         """Find patterns that can be optimized in the gate sequence."""
         patterns = []
         
         # Look for common patterns
         for i in range(len(sequence) - 1):
+            # Classically conditioned gates are never combined
+            if sequence[i]['condition'] is not None or sequence[i+1]['condition'] is not None:
+                continue
+            
             # Check for consecutive single-qubit gates
             if (len(sequence[i]['qubits']) == 1 and 
                 len(sequence[i+1]['qubits']) == 1 and 
                 sequence[i]['qubits'][0] == sequence[i+1]['qubits'][0]):
-                patterns.append((
-                    [sequence[i], sequence[i+1]],
-                    self._optimize_single_qubit_gates(sequence[i], sequence[i+1])
-                ))
+                replacement = self._optimize_single_qubit_gates(sequence[i], sequence[i+1])
+                if replacement is not None:
+                    patterns.append(([sequence[i], sequence[i+1]], replacement))
             
-            # Check for CNOT patterns
-            if (sequence[i]['gate'] == 'cx' and 
-                sequence[i+1]['gate'] == 'cx' and 
-                sequence[i]['qubits'] == sequence[i+1]['qubits'][::-1]):
+            # Check for CNOT (and other self-inverse two-qubit gate) patterns
+            elif (sequence[i]['gate'] in self.SELF_INVERSE_GATES and 
+                  sequence[i+1]['gate'] == sequence[i]['gate'] and 
+                  sequence[i]['qubits'] == sequence[i+1]['qubits']):
                 patterns.append((
                     [sequence[i], sequence[i+1]],
                     []  # CNOT pairs cancel out
@@ -128,26 +373,39 @@ class CircuitOptimizer:
         
         return patterns
     
-    def _optimize_single_qubit_gates(self, gate1: Dict, gate2: Dict) -> List[Dict]:
-        """Optimize consecutive single-qubit gates."""
+    def _optimize_single_qubit_gates(self, gate1: Dict, gate2: Dict) -> Optional[List[Dict]]:
+        """Optimize consecutive single-qubit gates, returning None if they do not combine."""
+        if gate1['gate'] != gate2['gate']:
+            return None
+        if gate1['gate'] in self.SELF_INVERSE_GATES:
+            return []
+        if gate1['gate'] not in self.ADDITIVE_ROTATIONS:
+            return None
+        
         # Combine parameters
         combined_params = self._combine_gate_parameters(gate1, gate2)
         
         # Return optimized gate if non-trivial
-        if any(p != 0 for p in combined_params):
+        if any(not self._is_zero_angle(p) for p in combined_params):
             return [{
                 'gate': gate1['gate'],
                 'qubits': gate1['qubits'],
-                'params': combined_params
+                'clbits': [],
+                'params': combined_params,
+                'condition': None
             }]
         return []
     
     def _combine_gate_parameters(self, gate1: Dict, gate2: Dict) -> List[float]:
-        """Combine parameters of two gates."""
-        # This is a simplified version - in practice, you'd need to handle
-        # different gate types and their parameter combinations
+        """Combine parameters of two gates; symbolic parameters combine into expressions."""
         return [p1 + p2 for p1, p2 in zip(gate1['params'], gate2['params'])]
     
+    def _is_zero_angle(self, angle) -> bool:
+        """Check whether an angle is numerically zero, including expressions such as t - t."""
+        if isinstance(angle, ParameterExpression) and angle.parameters:
+            return angle.sympify() == 0
+        return bool(np.isclose(float(angle), 0.0))
+    
     def _create_interaction_graph(self, circuit: QuantumCircuit) -> nx.Graph:
         """Create graph of qubit interactions."""
         graph = nx.Graph()
@@ -171,6 +429,10 @@ class CircuitOptimizer:
     
     def _find_optimal_mapping(self, graph: nx.Graph) -> Dict[int, int]:
         """Find optimal qubit mapping using graph partitioning."""
+        # Too few qubits to partition
+        if len(graph.nodes) < 3:
+            return {i: i for i in graph.nodes}
+        
         # Use spectral clustering to find optimal mapping
         from sklearn.cluster import SpectralClustering
         
@@ -183,21 +445,25 @@ class CircuitOptimizer:
             affinity='precomputed'
         ).fit(adj_matrix)
         
-        # Create mapping based on clusters
+        # Create mapping based on clusters, placing qubits of the same cluster
+        # on neighbouring indices so the mapping stays a permutation
+        labels = clustering.labels_
+        order = sorted(range(len(labels)), key=lambda i: (labels[i], i))
         mapping = {}
-        for i, label in enumerate(clustering.labels_):
-            mapping[i] = label
+        for position, qubit in enumerate(order):
+            mapping[qubit] = position
         
         return mapping
     
     def _apply_qubit_mapping(self, circuit: QuantumCircuit, mapping: Dict[int, int]) -> QuantumCircuit:
         """Apply qubit mapping to circuit."""
-        # Create new circuit with mapped qubits
-        new_circuit = QuantumCircuit(circuit.num_qubits)
+        # Create new circuit with mapped qubits, keeping the registers that
+        # classical conditions refer to
+        new_circuit = circuit.copy_empty_like()
         
         # Apply gates with mapped qubits
         for instruction, qargs, cargs in circuit.data:
             new_qargs = [mapping[q.index] for q in qargs]
-            new_circuit.append(instruction, new_qargs, cargs)
+            new_circuit.append(instruction, new_qargs, [c.index for c in cargs])
         
         return new_circuit 
\ No newline at end of file
@@ -0,0 +1,484 @@
+"""
+Compact binary circuit format and memory-mapped circuit corpora
+"""
+
+import mmap
+import struct
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from qiskit import ClassicalRegister, QuantumCircuit, QuantumRegister
+from qiskit.circuit import Barrier, Measure, Parameter, ParameterExpression, Reset
+from qiskit.circuit import library
+
+# Opcode table; the position of a name is its opcode, so entries are only ever appended
+OPCODES = (
+    'id', 'h', 'x', 'y', 'z', 's', 'sdg', 't', 'tdg', 'sx', 'sxdg',
+    'p', 'u1', 'u2', 'u3', 'u', 'rx', 'ry', 'rz',
+    'cx', 'cy', 'cz', 'swap', 'cp', 'cu1', 'crx', 'cry', 'crz', 'rzz',
+    'ccx', 'cswap', 'measure', 'reset', 'barrier'
+)
+OPCODE_INDEX = {name: code for code, name in enumerate(OPCODES)}
+
+_INSTRUCTION_CLASSES = {
+    'id': library.IGate, 'h': library.HGate, 'x': library.XGate, 'y': library.YGate,
+    'z': library.ZGate, 's': library.SGate, 'sdg': library.SdgGate, 't': library.TGate,
+    'tdg': library.TdgGate, 'sx': library.SXGate, 'sxdg': library.SXdgGate,
+    'p': library.PhaseGate, 'u1': library.U1Gate, 'u2': library.U2Gate, 'u3': library.U3Gate,
+    'u': library.UGate, 'rx': library.RXGate, 'ry': library.RYGate, 'rz': library.RZGate,
+    'cx': library.CXGate, 'cy': library.CYGate, 'cz': library.CZGate, 'swap': library.SwapGate,
+    'cp': library.CPhaseGate, 'cu1': library.CU1Gate, 'crx': library.CRXGate,
+    'cry': library.CRYGate, 'crz': library.CRZGate, 'rzz': library.RZZGate,
+    'ccx': library.CCXGate, 'cswap': library.CSwapGate, 'measure': Measure, 'reset': Reset
+}
+
+CIRCUIT_MAGIC = b'QAIC'
+CORPUS_MAGIC = b'QAICORP\0'
+FORMAT_VERSION = 1
+
+# magic, version, index width (bytes), num_qubits, num_clbits, num_instructions,
+# num_qargs, num_cargs, num_params, num_terms, symbol table bytes, name bytes,
+# num_qregs, num_cregs, register name bytes, global phase
+_CIRCUIT_HEADER = struct.Struct('<4sHHIIIIIIIIIIIId')
+# magic, version, reserved, circuit count, index offset
+_CORPUS_HEADER = struct.Struct('<8sIIQQ')
+
+INSTRUCTION_DTYPE = np.dtype([('opcode', '<u2'), ('num_params', '<u2'), ('num_qubits', '<u4'),
+                              ('num_clbits', '<u4'), ('reserved', '<u4')])
+# A parameter is value + sum(coeff * symbol) over its terms; literals have no terms
+PARAM_DTYPE = np.dtype([('value', '<f8'), ('term_start', '<u4'), ('num_terms', '<u4')])
+TERM_DTYPE = np.dtype([('symbol', '<u4'), ('coeff', '<f8')], align=True)
+CORPUS_INDEX_DTYPE = np.dtype([('offset', '<u8'), ('length', '<u8')])
+
+
+def _padded(data: bytes) -> bytes:
+    """Pad a block to a multiple of 8 bytes so following arrays stay aligned."""
+    return data + b'\0' * (-len(data) % 8)
+
+
+def _padded_size(size: int) -> int:
+    """Size of a block after padding."""
+    return size + (-size % 8)
+
+
+def _index_dtype(size: int) -> np.dtype:
+    """Choose the narrowest unsigned integer type that can index size bits."""
+    for dtype in ('u1', '<u2', '<u4'):
+        if size <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    raise ValueError("Circuit too large to serialize")
+
+
+def _linear_terms(expression: ParameterExpression) -> tuple:
+    """Split a parameter expression into a constant and per-parameter coefficients."""
+    by_name = {p.name: p for p in expression.parameters}
+    constant, terms = 0.0, []
+    for symbol, coeff in expression.sympify().as_coefficients_dict().items():
+        if symbol == 1:
+            constant += float(coeff)
+        elif str(symbol) in by_name:
+            terms.append((by_name[str(symbol)], float(coeff)))
+        else:
+            raise ValueError(f"Only linear parameter expressions can be serialized: {expression}")
+    return constant, terms
+
+
+def _register_sizes(registers: list, bits: list, kind: str) -> List[int]:
+    """Return register sizes, checking that the registers partition the bits in order."""
+    if [bit for register in registers for bit in register] != list(bits):
+        raise ValueError(f"Only circuits whose {kind}s each belong to exactly one register "
+                         f"can be serialized")
+    return [register.size for register in registers]
+
+
+def encode_circuit(circuit: QuantumCircuit) -> bytes:
+    """
+    Serialize a circuit to the compact binary format.
+
+    The record holds a fixed header followed by 8-byte aligned blocks: the
+    instruction table (opcode and operand counts), packed qubit and clbit
+    indices, the parameter block, linear parameter terms, register sizes, the
+    symbol table, register names and the circuit name. Symbolic angles are
+    supported as linear combinations of parameters, which covers what the
+    generator and optimizer produce.
+
+    Args:
+        circuit (QuantumCircuit): Circuit to serialize
+
+    Returns:
+        bytes: Serialized circuit
+    """
+    if isinstance(circuit.global_phase, ParameterExpression) and circuit.global_phase.parameters:
+        raise ValueError("Symbolic global phases cannot be serialized")
+    register_sizes = (_register_sizes(circuit.qregs, circuit.qubits, 'qubit')
+                      + _register_sizes(circuit.cregs, circuit.clbits, 'clbit'))
+
+    bit_indices = {bit: i for i, bit in enumerate(circuit.qubits)}
+    bit_indices.update({bit: i for i, bit in enumerate(circuit.clbits)})
+    symbols = {}
+
+    opcodes, qubit_counts, clbit_counts, param_counts = [], [], [], []
+    qargs, cargs, params, terms = [], [], [], []
+    for instruction, qubits, clbits in circuit.data:
+        if instruction.name not in OPCODE_INDEX:
+            raise ValueError(f"Unsupported instruction for serialization: {instruction.name}")
+        if getattr(instruction, 'condition', None) is not None:
+            raise ValueError("Conditional instructions cannot be serialized")
+        opcodes.append(OPCODE_INDEX[instruction.name])
+        qubit_counts.append(len(qubits))
+        clbit_counts.append(len(clbits))
+        param_counts.append(len(instruction.params))
+        qargs.extend(bit_indices[q] for q in qubits)
+        cargs.extend(bit_indices[c] for c in clbits)
+        for param in instruction.params:
+            if isinstance(param, ParameterExpression) and param.parameters:
+                constant, linear = _linear_terms(param)
+                params.append((constant, len(terms), len(linear)))
+                for parameter, coeff in linear:
+                    symbol = symbols.setdefault(parameter.name, len(symbols))
+                    terms.append((symbol, coeff))
+            else:
+                params.append((float(param), 0, 0))
+
+    instructions = np.zeros(len(opcodes), dtype=INSTRUCTION_DTYPE)
+    instructions['opcode'] = opcodes
+    instructions['num_qubits'] = qubit_counts
+    instructions['num_clbits'] = clbit_counts
+    instructions['num_params'] = param_counts
+
+    index_dtype = _index_dtype(max(circuit.num_qubits, circuit.num_clbits, 1))
+    symbol_table = '\0'.join(symbols).encode('utf-8')
+    register_names = '\0'.join(r.name for r in circuit.qregs + circuit.cregs).encode('utf-8')
+    name = (circuit.name or '').encode('utf-8')
+    header = _CIRCUIT_HEADER.pack(
+        CIRCUIT_MAGIC, FORMAT_VERSION, index_dtype.itemsize, circuit.num_qubits,
+        circuit.num_clbits, len(instructions), len(qargs), len(cargs), len(params),
+        len(terms), len(symbol_table), len(name), len(circuit.qregs), len(circuit.cregs),
+        len(register_names), float(circuit.global_phase)
+    )
+    blocks = [
+        header,
+        instructions.tobytes(),
+        np.asarray(qargs, dtype=index_dtype).tobytes(),
+        np.asarray(cargs, dtype=index_dtype).tobytes(),
+        np.asarray(params, dtype=PARAM_DTYPE).tobytes(),
+        np.asarray(terms, dtype=TERM_DTYPE).tobytes(),
+        np.asarray(register_sizes, dtype='<u4').tobytes(),
+        symbol_table,
+        register_names,
+        name
+    ]
+    return b''.join(_padded(block) for block in blocks)
+
+
+class CircuitRecord:
+    """Zero-copy view of one serialized circuit; arrays alias the underlying buffer."""
+
+    def __init__(self, buffer, offset: int = 0):
+        """
+        Parse the header and map the blocks of a serialized circuit.
+
+        Args:
+            buffer: bytes, memoryview or mmap holding the record
+            offset (int): Byte offset of the record within the buffer
+        """
+        fields = _CIRCUIT_HEADER.unpack_from(buffer, offset)
+        (magic, version, index_width, self.num_qubits, self.num_clbits, num_instructions,
+         num_qargs, num_cargs, num_params, num_terms, symbol_bytes, name_bytes,
+         num_qregs, num_cregs, register_bytes, self.global_phase) = fields
+        if magic != CIRCUIT_MAGIC:
+            raise ValueError("Not a serialized circuit")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported circuit format version: {version}")
+
+        index_dtype = np.dtype({1: 'u1', 2: '<u2', 4: '<u4'}[index_width])
+        position = offset + _padded_size(_CIRCUIT_HEADER.size)
+
+        def take(dtype, count):
+            nonlocal position
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=position)
+            position += _padded_size(array.nbytes)
+            return array
+
+        self.instructions = take(INSTRUCTION_DTYPE, num_instructions)
+        self.qargs = take(index_dtype, num_qargs)
+        self.cargs = take(index_dtype, num_cargs)
+        self.params = take(PARAM_DTYPE, num_params)
+        self.terms = take(TERM_DTYPE, num_terms)
+        register_sizes = take(np.dtype('<u4'), num_qregs + num_cregs).tolist()
+
+        def take_names(size):
+            nonlocal position
+            names = bytes(buffer[position:position + size]).decode('utf-8')
+            position += _padded_size(size)
+            return names.split('\0') if size else []
+
+        self.symbols = take_names(symbol_bytes)
+        register_names = take_names(register_bytes)
+        # (name, size) pairs for the quantum and then the classical registers
+        self.qregs = list(zip(register_names[:num_qregs], register_sizes[:num_qregs]))
+        self.cregs = list(zip(register_names[num_qregs:], register_sizes[num_qregs:]))
+        self.name = bytes(buffer[position:position + name_bytes]).decode('utf-8') or None
+
+    @property
+    def num_instructions(self) -> int:
+        """Number of instructions in the circuit."""
+        return len(self.instructions)
+
+    def gate_counts(self) -> Dict[str, int]:
+        """Count instructions by name without building the circuit."""
+        counts = np.bincount(self.instructions['opcode'], minlength=len(OPCODES))
+        return {OPCODES[code]: int(count) for code, count in enumerate(counts) if count}
+
+    def to_circuit(self) -> QuantumCircuit:
+        """Build the QuantumCircuit described by the record."""
+        registers = ([QuantumRegister(size, name) for name, size in self.qregs]
+                     + [ClassicalRegister(size, name) for name, size in self.cregs])
+        circuit = QuantumCircuit(*registers, name=self.name, global_phase=self.global_phase)
+        qubits, clbits = circuit.qubits, circuit.clbits
+        parameters = [Parameter(name) for name in self.symbols]
+
+        # Operand offsets are cumulative counts over the instruction table
+        qarg_ends = np.cumsum(self.instructions['num_qubits']).tolist()
+        carg_ends = np.cumsum(self.instructions['num_clbits']).tolist()
+        param_ends = np.cumsum(self.instructions['num_params']).tolist()
+        qargs, cargs = self.qargs.tolist(), self.cargs.tolist()
+        values = self._parameter_values(parameters)
+
+        q_start = c_start = p_start = 0
+        for code, q_end, c_end, p_end in zip(self.instructions['opcode'].tolist(),
+                                             qarg_ends, carg_ends, param_ends):
+            name = OPCODES[code]
+            gate_qubits = [qubits[i] for i in qargs[q_start:q_end]]
+            if name == 'barrier':
+                instruction = Barrier(len(gate_qubits))
+            else:
+                instruction = _INSTRUCTION_CLASSES[name](*values[p_start:p_end])
+            circuit._append(instruction, gate_qubits, [clbits[i] for i in cargs[c_start:c_end]])
+            q_start, c_start, p_start = q_end, c_end, p_end
+        return circuit
+
+    def _parameter_values(self, parameters: List[Parameter]) -> List:
+        """Rebuild gate parameters as floats or parameter expressions."""
+        values = self.params['value'].tolist()
+        term_starts = self.params['term_start'].tolist()
+        term_counts = self.params['num_terms'].tolist()
+        symbols = self.terms['symbol'].tolist()
+        coeffs = self.terms['coeff'].tolist()
+        for i, count in enumerate(term_counts):
+            if not count:
+                continue
+            start = term_starts[i]
+            expression = None
+            for symbol, coeff in zip(symbols[start:start + count], coeffs[start:start + count]):
+                term = parameters[symbol] if coeff == 1 else coeff * parameters[symbol]
+                expression = term if expression is None else expression + term
+            values[i] = expression + values[i] if values[i] else expression
+        return values
+
+
+def decode_circuit(buffer, offset: int = 0) -> QuantumCircuit:
+    """
+    Deserialize a circuit written by encode_circuit.
+
+    Args:
+        buffer: bytes, memoryview or mmap holding the record
+        offset (int): Byte offset of the record within the buffer
+
+    Returns:
+        QuantumCircuit: Decoded circuit
+    """
+    return CircuitRecord(buffer, offset).to_circuit()
+
+
+class CorpusWriter:
+    """Appends serialized circuits to a corpus file and writes its index on close."""
+
+    def __init__(self, path: str):
+        """
+        Create a corpus file.
+
+        Args:
+            path (str): Path of the corpus file; an existing file is replaced
+        """
+        self.path = path
+        self._file = open(path, 'wb')
+        self._file.write(_CORPUS_HEADER.pack(CORPUS_MAGIC, FORMAT_VERSION, 0, 0, 0))
+        self._index = []
+
+    def add(self, circuit: QuantumCircuit) -> int:
+        """Append a circuit and return its position in the corpus."""
+        record = encode_circuit(circuit)
+        self._index.append((self._file.tell(), len(record)))
+        self._file.write(record)
+        return len(self._index) - 1
+
+    def extend(self, circuits: Sequence[QuantumCircuit]):
+        """Append several circuits."""
+        for circuit in circuits:
+            self.add(circuit)
+
+    def close(self):
+        """Write the index and header and close the file."""
+        if self._file.closed:
+            return
+        index_offset = self._file.tell()
+        self._file.write(np.asarray(self._index, dtype=CORPUS_INDEX_DTYPE).tobytes())
+        self._file.seek(0)
+        self._file.write(_CORPUS_HEADER.pack(CORPUS_MAGIC, FORMAT_VERSION, 0,
+                                             len(self._index), index_offset))
+        self._file.close()
+
+    def __enter__(self) -> 'CorpusWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_corpus(path: str, circuits: Sequence[QuantumCircuit]):
+    """Write circuits to a new corpus file."""
+    with CorpusWriter(path) as writer:
+        writer.extend(circuits)
+
+
+class CircuitCorpus:
+    """Read-only, memory-mapped corpus of serialized circuits with random access."""
+
+    def __init__(self, path: str):
+        """
+        Map a corpus file into memory.
+
+        Only the header and index are read; circuits are decoded on access, and
+        processes that map the same file share its pages.
+
+        Args:
+            path (str): Path of a file written by CorpusWriter
+        """
+        self.path = path
+        with open(path, 'rb') as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, count, index_offset = _CORPUS_HEADER.unpack_from(self._mmap, 0)
+            if magic != CORPUS_MAGIC:
+                raise ValueError(f"Not a circuit corpus: {path}")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported corpus format version: {version}")
+            self.index = np.frombuffer(self._mmap, dtype=CORPUS_INDEX_DTYPE, count=count,
+                                       offset=index_offset)
+        except (ValueError, struct.error):
+            self._mmap.close()
+            raise
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def record(self, i: int) -> CircuitRecord:
+        """Return a zero-copy view of circuit i."""
+        return CircuitRecord(self._buffer(), int(self.index[i]['offset']))
+
+    def raw(self, i: int) -> memoryview:
+        """Return the serialized bytes of circuit i without copying."""
+        buffer = self._buffer()
+        offset, length = int(self.index[i]['offset']), int(self.index[i]['length'])
+        return memoryview(buffer)[offset:offset + length]
+
+    def _buffer(self) -> mmap.mmap:
+        if self._mmap is None:
+            raise ValueError("Corpus is closed")
+        return self._mmap
+
+    def __getitem__(self, i: int) -> QuantumCircuit:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("corpus index out of range")
+        return self.record(i).to_circuit()
+
+    def __iter__(self) -> Iterator[QuantumCircuit]:
+        for i in range(len(self)):
+            yield self.record(i).to_circuit()
+
+    def iter_batches(self, batch_size: int, indices: Optional[Sequence[int]] = None
+                     ) -> Iterator[List[QuantumCircuit]]:
+        """
+        Decode circuits in batches, e.g. for optimize_batch/verify_batch.
+
+        Args:
+            batch_size (int): Circuits per batch
+            indices (Sequence[int], optional): Circuits to read; defaults to all
+
+        Yields:
+            List[QuantumCircuit]: Decoded batch
+        """
+        indices = range(len(self)) if indices is None else indices
+        for start in range(0, len(indices), batch_size):
+            yield [self.record(i).to_circuit() for i in indices[start:start + batch_size]]
+
+    def close(self):
+        """
+        Close the corpus.
+
+        Records and raw views returned earlier stay valid; while any of them is
+        alive the file remains mapped, and it is unmapped once they are released.
+        """
+        if self._mmap is None:
+            return
+        buffer, self._mmap = self._mmap, None
+        self.index = np.empty(0, dtype=CORPUS_INDEX_DTYPE)
+        try:
+            buffer.close()
+        except BufferError:
+            # Live views hold exports of the map; it is unmapped when they are freed
+            pass
+
+    def __enter__(self) -> 'CircuitCorpus':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# Corpus opened once per pool worker by _init_worker
+_worker_corpus = None
+
+
+def _init_worker(path: str):
+    global _worker_corpus
+    _worker_corpus = CircuitCorpus(path)
+
+
+def _apply_to_range(func: Callable, indices: List[int]) -> List:
+    return [func(_worker_corpus.record(i).to_circuit()) for i in indices]
+
+
+def map_corpus(path: str, func: Callable[[QuantumCircuit], object],
+               indices: Optional[Sequence[int]] = None,
+               processes: Optional[int] = None, chunksize: int = 64) -> List:
+    """
+    Apply a function to corpus circuits on a process pool.
+
+    Workers map the corpus file themselves and receive only index ranges, so
+    circuit data is never pickled between processes.
+
+    Args:
+        path (str): Corpus file
+        func (Callable): Picklable (module-level) function of a circuit
+        indices (Sequence[int], optional): Circuits to process; defaults to all
+        processes (int, optional): Worker count; defaults to the CPU count
+        chunksize (int): Circuits per task
+
+    Returns:
+        List: Results in index order
+    """
+    if indices is None:
+        with CircuitCorpus(path) as corpus:
+            indices = range(len(corpus))
+    indices = list(indices)
+    chunks = [indices[i:i + chunksize] for i in range(0, len(indices), chunksize)]
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(path,)) as pool:
+        results = pool.map(_apply_to_range, [func] * len(chunks), chunks)
+        return [result for chunk in results for result in chunk]
@@ -0,0 +1,379 @@
+"""
+Asynchronous generate -> optimize -> verify service
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from qiskit import QuantumCircuit
+
+from .code_generator import QuantumCodeGenerator
+from .optimizer import CircuitOptimizer
+from .verifier import CircuitVerifier
+
+# Per-process optimizer and verifier, created on first use in each pool worker
+_worker_state = {}
+
+
+def _to_jsonable(value):
+    """Convert a verification result to JSON-compatible values, dropping arrays."""
+    if isinstance(value, dict):
+        return {str(k): _to_jsonable(v) for k, v in value.items()
+                if not isinstance(v, np.ndarray)}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, complex):
+        return [value.real, value.imag]
+    return value
+
+
+def optimize_and_verify(circuit: QuantumCircuit, method: str, optimize: bool = True) -> Dict:
+    """
+    Optimize and verify a circuit inside a pool worker.
+
+    Args:
+        circuit (QuantumCircuit): Generated circuit
+        method (str): CircuitVerifier method
+        optimize (bool): Whether to run CircuitOptimizer first
+
+    Returns:
+        Dict: OpenQASM of the final circuit, its size and depth, and the
+        JSON-compatible verification result
+    """
+    if not _worker_state:
+        _worker_state['optimizer'] = CircuitOptimizer()
+        _worker_state['verifier'] = CircuitVerifier()
+    if optimize:
+        circuit = _worker_state['optimizer'].optimize(circuit)
+    result = _worker_state['verifier'].verify(circuit, method=method)
+    return {
+        'qasm': circuit.qasm(),
+        'num_qubits': circuit.num_qubits,
+        'size': circuit.size(),
+        'depth': circuit.depth(),
+        'verification': _to_jsonable(result)
+    }
+
+
+class _Request:
+    """A request travelling through the pipeline."""
+
+    __slots__ = ('specification', 'method', 'future', 'deadline')
+
+    def __init__(self, specification: str, method: str, future: asyncio.Future, deadline: float):
+        self.specification = specification
+        self.method = method
+        self.future = future
+        self.deadline = deadline
+
+    @property
+    def abandoned(self) -> bool:
+        """Whether the caller has cancelled or the deadline has passed."""
+        return self.future.done() or time.monotonic() > self.deadline
+
+
+class PipelineService:
+    """Runs generate -> optimize -> verify as concurrent stages connected by bounded queues."""
+
+    def __init__(self, generator: QuantumCodeGenerator, method: str = 'state_vector',
+                 optimize: bool = True, max_batch_size: int = 8, batch_window: float = 0.005,
+                 queue_size: int = 64, num_workers: Optional[int] = None,
+                 default_timeout: float = 30.0):
+        """
+        Initialize the service.
+
+        Args:
+            generator (QuantumCodeGenerator): Generator run on a dedicated inference thread
+            method (str): Default CircuitVerifier method
+            optimize (bool): Whether to run CircuitOptimizer before verification
+            max_batch_size (int): Largest inference micro-batch
+            batch_window (float): Seconds to wait for more requests to coalesce
+                after the first request of a batch arrives
+            queue_size (int): Capacity of each inter-stage queue; submitters
+                wait when the generation queue is full
+            num_workers (int, optional): Optimize/verify worker processes;
+                defaults to the CPU count
+            default_timeout (float): Per-request deadline in seconds
+        """
+        self.generator = generator
+        self.method = method
+        self.optimize = optimize
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self.queue_size = queue_size
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.default_timeout = default_timeout
+        self._tasks = []
+        self._pending = set()
+        self._inference_executor = None
+        self._process_pool = None
+        self._generate_queue = None
+        self._verify_queue = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the stage tasks are running."""
+        return bool(self._tasks)
+
+    async def start(self):
+        """Start the executors and stage tasks."""
+        if self.running:
+            return
+        self._inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='inference')
+        # Spawned workers avoid inheriting the model and its thread pools
+        self._process_pool = ProcessPoolExecutor(
+            max_workers=self.num_workers, mp_context=multiprocessing.get_context('spawn')
+        )
+        self._generate_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._verify_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.ensure_future(self._generate_stage())]
+        self._tasks += [asyncio.ensure_future(self._verify_stage()) for _ in range(self.num_workers)]
+
+    async def stop(self):
+        """Cancel the stage tasks, fail requests still in flight and shut down the executors."""
+        if not self.running:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for request in self._pending:
+            if not request.future.done():
+                request.future.set_exception(RuntimeError("PipelineService stopped"))
+        self._pending.clear()
+        self._inference_executor.shutdown(wait=False)
+        self._process_pool.shutdown(wait=False)
+
+    async def __aenter__(self) -> 'PipelineService':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    async def submit(self, specification: str, method: Optional[str] = None,
+                     timeout: Optional[float] = None) -> Dict:
+        """
+        Run one specification through the pipeline.
+
+        Args:
+            specification (str): Natural language description of the circuit
+            method (str, optional): CircuitVerifier method; defaults to the service method
+            timeout (float, optional): Deadline in seconds, covering queueing time
+
+        Returns:
+            Dict: Result of optimize_and_verify
+
+        Raises:
+            asyncio.TimeoutError: If the deadline passes first
+            RuntimeError: If the service stops before the request completes
+        """
+        if not self.running:
+            raise RuntimeError("PipelineService is not running")
+        method = method or self.method
+        if method not in CircuitVerifier.VERIFICATION_METHODS:
+            raise ValueError(f"Unknown verification method: {method}")
+        timeout = self.default_timeout if timeout is None else timeout
+
+        future = asyncio.get_running_loop().create_future()
+        request = _Request(specification, method, future, time.monotonic() + timeout)
+
+        async def run():
+            # Waiting on the future too lets stop() release submitters blocked on a full queue
+            put = asyncio.ensure_future(self._generate_queue.put(request))
+            try:
+                await asyncio.wait((put, future), return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                put.cancel()
+            return await future
+
+        self._pending.add(request)
+        try:
+            return await asyncio.wait_for(run(), timeout)
+        finally:
+            self._pending.discard(request)
+            # Lets the stages skip work for requests that timed out or were cancelled
+            future.cancel()
+
+    async def _generate_stage(self):
+        """Coalesce queued requests into micro-batches and run inference."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._generate_queue.get()]
+            window_end = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                remaining = window_end - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._generate_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [request for request in batch if not request.abandoned]
+            if not batch:
+                continue
+            try:
+                # Malformed programs come back as exceptions in place of their circuits
+                circuits = await loop.run_in_executor(
+                    self._inference_executor,
+                    functools.partial(self.generator.generate_batch,
+                                      [request.specification for request in batch],
+                                      return_exceptions=True)
+                )
+            except Exception as e:
+                # The model call itself failed
+                circuits = [e] * len(batch)
+
+            for request, circuit in zip(batch, circuits):
+                if isinstance(circuit, Exception):
+                    if not request.future.done():
+                        request.future.set_exception(circuit)
+                    continue
+                await self._verify_queue.put((request, circuit))
+
+    async def _verify_stage(self):
+        """Optimize and verify generated circuits on the process pool."""
+        loop = asyncio.get_running_loop()
+        while True:
+            request, circuit = await self._verify_queue.get()
+            if request.abandoned:
+                continue
+            try:
+                result = await loop.run_in_executor(
+                    self._process_pool, optimize_and_verify, circuit, request.method, self.optimize
+                )
+            except Exception as e:
+                if not request.future.done():
+                    request.future.set_exception(e)
+                continue
+            if not request.future.done():
+                request.future.set_result(result)
+
+
+async def _read_http_request(reader: asyncio.StreamReader):
+    """Read an HTTP/1.1 request line, headers and body."""
+    request_line = (await reader.readline()).decode('latin-1').strip()
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        key, _, value = line.partition(':')
+        headers[key.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    method, path, _ = request_line.split(' ', 2)
+    return method, path, body
+
+
+def _http_response(status: int, payload: Dict) -> bytes:
+    """Encode a JSON HTTP response."""
+    reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+               500: 'Internal Server Error', 504: 'Gateway Timeout'}
+    body = json.dumps(payload).encode('utf-8')
+    head = (f"HTTP/1.1 {status} {reasons[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n")
+    return head.encode('latin-1') + body
+
+
+async def serve_http(service: PipelineService, host: str = '127.0.0.1', port: int = 8080):
+    """
+    Expose the service over HTTP/JSON.
+
+    ``POST /generate`` takes ``{"specification": ..., "method": ..., "timeout": ...}``
+    and returns the pipeline result; ``GET /health`` reports queue depths.
+
+    Args:
+        service (PipelineService): Running service
+        host (str): Interface to bind
+        port (int): Port to bind; 0 picks a free port
+
+    Returns:
+        asyncio.AbstractServer: The listening server
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, body = await _read_http_request(reader)
+            if method == 'GET' and path == '/health':
+                status, payload = 200, {
+                    'status': 'ok',
+                    'generate_queue': service._generate_queue.qsize(),
+                    'verify_queue': service._verify_queue.qsize()
+                }
+            elif method == 'POST' and path == '/generate':
+                request = json.loads(body or b'{}')
+                if not isinstance(request, dict):
+                    raise ValueError("Request body must be a JSON object")
+                if not isinstance(request.get('specification'), str):
+                    raise ValueError("'specification' must be a string")
+                timeout = request.get('timeout')
+                if timeout is not None and (isinstance(timeout, bool)
+                                            or not isinstance(timeout, (int, float))
+                                            or timeout <= 0):
+                    raise ValueError("'timeout' must be a positive number of seconds")
+                result = await service.submit(request['specification'], request.get('method'),
+                                              request.get('timeout'))
+                status, payload = 200, result
+            else:
+                status, payload = 404, {'error': f"No route for {method} {path}"}
+        except asyncio.TimeoutError:
+            status, payload = 504, {'error': 'deadline exceeded'}
+        except ValueError as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+        writer.write(_http_response(status, payload))
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def _serve_forever(args):
+    generator = QuantumCodeGenerator(args.model, inference_mode=args.inference_mode,
+                                     decoding=args.decoding)
+    async with PipelineService(generator, method=args.method, max_batch_size=args.batch_size,
+                               batch_window=args.batch_window / 1000, queue_size=args.queue_size,
+                               num_workers=args.workers, default_timeout=args.timeout) as service:
+        server = await serve_http(service, args.host, args.port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point for the HTTP service."""
+    parser = argparse.ArgumentParser(description="Serve generate/optimize/verify over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--model', default='t5-base')
+    parser.add_argument('--inference-mode', choices=QuantumCodeGenerator.INFERENCE_MODES, default='default')
+    parser.add_argument('--decoding', choices=QuantumCodeGenerator.DECODING_STRATEGIES, default='beam')
+    parser.add_argument('--method', choices=CircuitVerifier.VERIFICATION_METHODS, default='state_vector')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--batch-window', type=float, default=5.0, help="coalescing window in ms")
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve_forever(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -5,18 +5,95 @@ Quantum circuit verification module
 import numpy as np
 from qiskit import QuantumCircuit, execute, Aer
 from qiskit.quantum_info import Statevector, Operator, state_fidelity
+from qiskit.circuit import Parameter, ParameterExpression
 from qiskit.providers.aer import QasmSimulator
 from qiskit.visualization import plot_histogram
 import matplotlib.pyplot as plt
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional, Union
 import networkx as nx
 from scipy.linalg import expm
 
+from .instrumentation import Tracer, get_tracer
+
+
+def _stack_matrix(rows: List[List]) -> np.ndarray:
+    """Build a (..., d, d) matrix array from entries that broadcast over the parameter axis."""
+    entries = np.broadcast_arrays(*[np.asarray(e, dtype=complex) for row in rows for e in row])
+    d = len(rows)
+    return np.stack(entries, axis=-1).reshape(entries[0].shape + (d, d))
+
+
+def _rx(theta):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return _stack_matrix([[c, -1j * s], [-1j * s, c]])
+
+
+def _ry(theta):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return _stack_matrix([[c, -s], [s, c]])
+
+
+def _rz(theta):
+    zero = np.zeros_like(theta)
+    return _stack_matrix([[np.exp(-0.5j * theta), zero], [zero, np.exp(0.5j * theta)]])
+
+
+def _phase(theta):
+    zero = np.zeros_like(theta)
+    return _stack_matrix([[1 + zero, zero], [zero, np.exp(1j * theta)]])
+
+
+def _u3(theta, phi, lam):
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return _stack_matrix([[c, -np.exp(1j * lam) * s],
+                          [np.exp(1j * phi) * s, np.exp(1j * (phi + lam)) * c]])
+
+
+def _controlled(single):
+    """Build a controlled gate builder, with the control as the first (least significant) qubit."""
+    def build(*params):
+        u = single(*params)
+        zero = np.zeros(u.shape[:-2])
+        one = zero + 1
+        return _stack_matrix([[one, zero, zero, zero],
+                              [zero, u[..., 0, 0], zero, u[..., 0, 1]],
+                              [zero, zero, one, zero],
+                              [zero, u[..., 1, 0], zero, u[..., 1, 1]]])
+    return build
+
+
+# Gate matrices built as arrays stacked over the parameter axis
+PARAMETERIZED_GATES = {
+    'rx': _rx,
+    'ry': _ry,
+    'rz': _rz,
+    'p': _phase,
+    'u1': _phase,
+    'u': _u3,
+    'u3': _u3,
+    'cp': _controlled(_phase),
+    'cu1': _controlled(_phase),
+    'crx': _controlled(_rx),
+    'cry': _controlled(_ry),
+    'crz': _controlled(_rz)
+}
+
 class CircuitVerifier:
     """AI-powered quantum circuit verifier that ensures correctness and reliability."""
     
-    def __init__(self, backend: str = 'qasm_simulator'):
-        """Initialize the circuit verifier with specified backend."""
+    SHOTS = 1000
+    VERIFICATION_METHODS = ('state_vector', 'unitary', 'measurement', 'error_detection')
+    
+    def __init__(self, backend: str = 'qasm_simulator', tracer: Optional[Tracer] = None):
+        """
+        Initialize the circuit verifier with specified backend.
+        
+        Args:
+            backend (str): Name of the Aer backend
+            tracer (Tracer, optional): Instrumentation sink; defaults to the
+                process-wide tracer, which is disabled unless enabled
+        """
+        self.tracer = tracer if tracer is not None else get_tracer()
         self.backend = Aer.get_backend(backend)
         self.simulator = QasmSimulator()
         self.verification_methods = {
@@ -41,14 +118,48 @@ class CircuitVerifier:
         """
         if method not in self.verification_methods:
             raise ValueError(f"Unknown verification method: {method}")
+        if circuit.parameters:
+            names = ', '.join(p.name for p in circuit.parameters)
+            raise ValueError(f"Circuit has unbound parameters ({names}); bind them with "
+                             f"assign_parameters or use evaluate_parameter_sweep")
+        
+        with self.tracer.span('verify', method=method, num_qubits=circuit.num_qubits) as span:
+            result = self.verification_methods[method](circuit, expected_result)
+        
+        trace = span.to_dict()
+        if trace is not None:
+            result['trace'] = trace
+        return result
+    
+    def verify_batch(self, circuits: List[QuantumCircuit], method: str = 'state_vector',
+                     expected_results: Optional[List] = None) -> List[Dict]:
+        """
+        Verify several circuits with the same method.
+        
+        Args:
+            circuits (List[QuantumCircuit]): Circuits to verify, e.g. a batch
+                from ``CircuitCorpus.iter_batches``
+            method (str): Verification method to use
+            expected_results (List, optional): Expected result per circuit
             
-        return self.verification_methods[method](circuit, expected_result)
+        Returns:
+            List[Dict]: Verification results, in input order
+        """
+        if expected_results is None:
+            expected_results = [None] * len(circuits)
+        if len(expected_results) != len(circuits):
+            raise ValueError("expected_results must match circuits in length")
+        
+        with self.tracer.span('verify_batch', method=method, batch_size=len(circuits)):
+            return [self.verify(circuit, method, expected)
+                    for circuit, expected in zip(circuits, expected_results)]
     
     def _verify_state_vector(self, circuit: QuantumCircuit, 
                            expected_state: Optional[np.ndarray] = None) -> Dict:
         """Verify circuit using state vector simulation."""
         # Get actual state vector
-        state = Statevector.from_instruction(circuit)
+        with self.tracer.span('statevector_simulation'):
+            state = Statevector.from_instruction(circuit)
         actual_state = state.data
         
         # Compare with expected state if provided
@@ -76,7 +187,8 @@ class CircuitVerifier:
                        expected_unitary: Optional[np.ndarray] = None) -> Dict:
         """Verify circuit using unitary matrix simulation."""
         # Get actual unitary
-        unitary = Operator(circuit).data
+        with self.tracer.span('unitary_simulation'):
+            unitary = Operator(circuit).data
         
         # Compare with expected unitary if provided
         if expected_unitary is not None:
@@ -103,9 +215,7 @@ class CircuitVerifier:
                           expected_distribution: Optional[Dict] = None) -> Dict:
         """Verify circuit using measurement statistics."""
         # Execute circuit
-        job = execute(circuit, self.simulator, shots=1000)
-        result = job.result()
-        counts = result.get_counts()
+        counts = self._run_shots(circuit)
         
         # Compare with expected distribution if provided
         if expected_distribution is not None:
@@ -119,7 +229,7 @@ class CircuitVerifier:
         
         # Verify measurement properties
         total_shots = sum(counts.values())
-        is_normalized = np.isclose(total_shots, 1000)
+        is_normalized = np.isclose(total_shots, self.SHOTS)
         has_expected_basis = all(len(k) == circuit.num_qubits for k in counts.keys())
         
         return {
@@ -142,9 +252,7 @@ class CircuitVerifier:
         
         for error_circuit, error_info in error_circuits:
             # Execute error circuit
-            job = execute(error_circuit, self.simulator, shots=1000)
-            result = job.result()
-            counts = result.get_counts()
+            counts = self._run_shots(error_circuit)
             
             # Check if error was detected
             error_detected = self._check_error_detection(counts, error_info)
@@ -163,6 +271,166 @@ class CircuitVerifier:
             'error_detection_results': detection_results
         }
     
+    def _run_shots(self, circuit: QuantumCircuit) -> Dict:
+        """Sample the circuit on the simulator and return the measurement counts."""
+        with self.tracer.span('shot_simulation', shots=self.SHOTS):
+            job = execute(circuit, self.simulator, shots=self.SHOTS)
+            counts = job.result().get_counts()
+        self.tracer.count('verifier_shots_total', self.SHOTS)
+        return counts
+    
+    def evaluate_parameter_sweep(self, circuit: QuantumCircuit,
+                                 bindings: Dict[Union[Parameter, str], np.ndarray],
+                                 observable=None,
+                                 expected_state: Optional[np.ndarray] = None,
+                                 grid: bool = False,
+                                 return_states: bool = False) -> Dict:
+        """
+        Evaluate a parameterized circuit at many parameter values in one vectorized pass.
+        
+        The circuit is simulated once for all points: every gate is applied as
+        a matrix stacked over the parameter axis, so the cost per point is a
+        small fraction of building and simulating a bound circuit per value.
+        
+        Args:
+            circuit (QuantumCircuit): Parameterized circuit; final measurements are ignored
+            bindings (Dict): Values for each circuit parameter, keyed by Parameter or name
+            observable (optional): Pauli label, matrix or Operator whose
+                expectation value is computed at every point
+            expected_state (np.ndarray, optional): State to compute fidelities against
+            grid (bool): Evaluate the Cartesian product of the bindings instead
+                of zipping equal-length value arrays
+            return_states (bool): Include the statevectors in the result
+            
+        Returns:
+            Dict: Sweep results, with per-point arrays shaped like the sweep
+        """
+        with self.tracer.span('parameter_sweep', num_qubits=circuit.num_qubits) as span:
+            parameters, values, shape = self._resolve_bindings(circuit, bindings, grid)
+            num_points = int(np.prod(shape))
+            span.set('num_points', num_points)
+            states = self._sweep_statevectors(circuit, values, num_points)
+        
+        norms = np.sum(np.abs(states) ** 2, axis=1)
+        is_normalized = bool(np.allclose(norms, 1.0))
+        result = {
+            'verified': is_normalized,
+            'is_normalized': is_normalized,
+            'parameters': [p.name for p in parameters],
+            'shape': shape,
+            'num_points': num_points
+        }
+        if observable is not None:
+            if isinstance(observable, str):
+                matrix = Operator.from_label(observable).data
+            else:
+                matrix = np.asarray(getattr(observable, 'data', observable))
+            expectation = np.einsum('pi,pi->p', states.conj(), states @ matrix.T).real
+            result['expectation_values'] = expectation.reshape(shape)
+        if expected_state is not None:
+            overlaps = states @ np.asarray(expected_state).conj()
+            result['fidelities'] = (np.abs(overlaps) ** 2).reshape(shape)
+        if return_states:
+            result['statevectors'] = states.reshape(shape + (states.shape[1],))
+        trace = span.to_dict()
+        if trace is not None:
+            result['trace'] = trace
+        return result
+    
+    def _resolve_bindings(self, circuit: QuantumCircuit, bindings: Dict,
+                          grid: bool) -> Tuple[List[Parameter], Dict[Parameter, np.ndarray], tuple]:
+        """Match bindings to circuit parameters and flatten them to per-point arrays."""
+        by_name = {p.name: p for p in circuit.parameters}
+        resolved = {}
+        for key, value in bindings.items():
+            name = key.name if isinstance(key, Parameter) else key
+            if name not in by_name:
+                raise ValueError(f"Circuit has no parameter named {name}")
+            resolved[by_name[name]] = np.asarray(value, dtype=float).ravel()
+        
+        missing = set(by_name) - {p.name for p in resolved}
+        if missing:
+            raise ValueError(f"No values bound for parameters: {sorted(missing)}")
+        
+        parameters = sorted(resolved, key=lambda p: p.name)
+        if grid:
+            axes = [resolved[p] for p in parameters]
+            shape = tuple(len(a) for a in axes)
+            mesh = np.meshgrid(*axes, indexing='ij')
+            return parameters, {p: m.ravel() for p, m in zip(parameters, mesh)}, shape
+        
+        lengths = {len(resolved[p]) for p in parameters}
+        if len(lengths) > 1:
+            raise ValueError("Bindings must have equal lengths unless grid=True")
+        return parameters, resolved, (lengths.pop() if lengths else 1,)
+    
+    def _evaluate_angle(self, angle, values: Dict[Parameter, np.ndarray], num_points: int):
+        """Evaluate a gate angle as a float, or as an array over the parameter axis."""
+        if not isinstance(angle, ParameterExpression) or not angle.parameters:
+            return float(angle)
+        if isinstance(angle, Parameter):
+            return values[angle]
+        
+        parameters = list(angle.parameters)
+        try:
+            import sympy
+            func = sympy.lambdify([sympy.Symbol(p.name) for p in parameters], angle.sympify(), 'numpy')
+            evaluated = np.asarray(func(*[values[p] for p in parameters]), dtype=float)
+            return np.broadcast_to(evaluated, (num_points,))
+        except Exception:
+            # Fall back to binding the expression point by point
+            return np.array([
+                float(angle.bind({p: values[p][i] for p in parameters}))
+                for i in range(num_points)
+            ])
+    
+    def _sweep_statevectors(self, circuit: QuantumCircuit, values: Dict[Parameter, np.ndarray],
+                            num_points: int) -> np.ndarray:
+        """Simulate the circuit for every parameter point at once."""
+        circuit = circuit.remove_final_measurements(inplace=False)
+        num_qubits = circuit.num_qubits
+        
+        # Axis 0 is the parameter axis; qubit q lives on axis num_qubits - q
+        state = np.zeros((num_points,) + (2,) * num_qubits, dtype=complex)
+        state[(slice(None),) + (0,) * num_qubits] = 1.0
+        
+        constant_matrices = {}
+        for instruction, qargs, _ in circuit.data:
+            if instruction.name == 'barrier':
+                continue
+            if instruction.name in ('measure', 'reset'):
+                raise ValueError("Parameter sweeps support only unitary circuits")
+            
+            angles = [self._evaluate_angle(p, values, num_points) for p in instruction.params]
+            if any(isinstance(a, np.ndarray) for a in angles):
+                if instruction.name not in PARAMETERIZED_GATES:
+                    raise ValueError(f"Unsupported parameterized gate: {instruction.name}")
+                matrix = PARAMETERIZED_GATES[instruction.name](*angles)
+            else:
+                key = (instruction.name, tuple(angles))
+                if key not in constant_matrices:
+                    constant_matrices[key] = Operator(instruction).data
+                matrix = constant_matrices[key]
+            
+            state = self._apply_stacked_matrix(state, matrix, [q.index for q in qargs], num_qubits)
+        
+        return state.reshape(num_points, 2 ** num_qubits)
+    
+    def _apply_stacked_matrix(self, state: np.ndarray, matrix: np.ndarray,
+                              qubits: List[int], num_qubits: int) -> np.ndarray:
+        """Apply a (d, d) or per-point (P, d, d) gate matrix to a batch of states."""
+        k = len(qubits)
+        # Qiskit orders matrix indices with the first qubit least significant
+        axes = [num_qubits - q for q in reversed(qubits)]
+        targets = list(range(num_qubits + 1 - k, num_qubits + 1))
+        moved = np.moveaxis(state, axes, targets)
+        flat = moved.reshape(moved.shape[0], -1, 2 ** k)
+        if matrix.ndim == 2:
+            flat = flat @ matrix.T
+        else:
+            flat = np.einsum('pij,prj->pri', matrix, flat)
+        return np.moveaxis(flat.reshape(moved.shape), targets, axes)
+    
     def _check_unitary(self, matrix: np.ndarray) -> bool:
         """Check if a matrix is unitary."""
         return np.allclose(matrix @ matrix.conj().T, np.eye(len(matrix)))
@@ -30,6 +30,12 @@ setup(
     ],
     python_requires=">=3.8",
     install_requires=requirements,
+    entry_points={
+        "console_scripts": [
+            "quantum-ai-benchmark=quantum_ai_engineering.benchmark:main",
+            "quantum-ai-serve=quantum_ai_engineering.service:main",
+        ],
+    },
     extras_require={
         "dev": [
             "pytest>=6.2.0",
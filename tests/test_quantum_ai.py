@@ -2,11 +2,34 @@
 Tests for the quantum AI engineering framework
 """
 
+import asyncio
+import io
+import json
+import time
+import numpy as np
 import pytest
-from qiskit import QuantumCircuit
+from qiskit import ClassicalRegister, QuantumCircuit, QuantumRegister
+from qiskit.circuit import Parameter
+from qiskit.quantum_info import Operator, Statevector
 from quantum_ai_engineering.code_generator import QuantumCodeGenerator
 from quantum_ai_engineering.optimizer import CircuitOptimizer
 from quantum_ai_engineering.verifier import CircuitVerifier
+from quantum_ai_engineering.instrumentation import NULL_SPAN, Tracer
+from quantum_ai_engineering.service import PipelineService, optimize_and_verify, serve_http
+from quantum_ai_engineering.serialization import (
+    CircuitCorpus,
+    decode_circuit,
+    encode_circuit,
+    map_corpus,
+    write_corpus
+)
+from quantum_ai_engineering.benchmark import (
+    StubCodeGenerator,
+    build_circuit,
+    ghz_program,
+    compare_to_baseline,
+    run_benchmarks
+)
 
 def test_code_generation():
     """Test quantum code generation from natural language."""
@@ -92,4 +115,358 @@ def test_invalid_input():
     
     verifier = CircuitVerifier()
     with pytest.raises(ValueError):
-        verifier.verify(None, method='invalid_method') 
\ No newline at end of file
+        verifier.verify(None, method='invalid_method')
+
+def test_quantized_greedy_first_generation():
+    """Test the quantized inference path with greedy-first decoding."""
+    generator = QuantumCodeGenerator(inference_mode='quantized', decoding='greedy_first')
+    
+    circuit = generator.generate("Create a Bell state circuit with 2 qubits")
+    assert circuit.num_qubits >= 1
+    
+    metrics = generator.get_metrics()
+    assert metrics['requests'] == 1
+    assert metrics['inference_mode'] == 'quantized'
+    assert metrics['mean_latency'] > 0
+    assert 0.0 <= metrics['parse_success_rate'] <= 1.0
+    assert metrics['beam_fallbacks'] <= 1
+
+def test_greedy_first_falls_back_on_missing_arguments():
+    """Test that a greedy program missing required arguments falls back to beam search."""
+    class GreedyTypoGenerator(StubCodeGenerator):
+        def _decode_batch(self, inputs, num_beams):
+            return ['h(qubit=0)' if num_beams == 1 else 'h(target=0)' for _ in inputs['input_ids']]
+    
+    generator = GreedyTypoGenerator(decoding='greedy_first')
+    circuit = generator.generate("Apply a Hadamard gate")
+    assert [inst.operation.name for inst in circuit.data] == ['h']
+    assert generator.get_metrics()['beam_fallbacks'] == 1
+
+def test_invalid_inference_options():
+    """Test that unknown inference options are rejected before model loading."""
+    with pytest.raises(ValueError):
+        QuantumCodeGenerator(inference_mode='fp8')
+    
+    with pytest.raises(ValueError):
+        QuantumCodeGenerator(decoding='sampling')
+
+def test_benchmark_suite_offline():
+    """Test the benchmark suite with the offline stub generator."""
+    assert build_circuit('ghz', 3, 0).num_qubits == 3
+    assert len(build_circuit('clifford_t', 3, 40).data) == 40
+    
+    circuit = StubCodeGenerator().generate("h(target=0)\ncnot(control=0, target=1)")
+    assert circuit.num_qubits == 2
+    
+    report = run_benchmarks([2], [10], families=['ghz', 'cnot_ladder'],
+                            methods=['state_vector'], repeats=2)
+    timed = [r for r in report['results'] if 'p50' in r]
+    assert {r['stage'] for r in timed} == {'generate', 'optimize', 'verify'}
+    assert all(r['p99'] >= r['p50'] > 0 for r in timed)
+    assert all(r['peak_alloc_kb'] >= 0 for r in timed)
+    
+    # A report never regresses against itself, but does against a faster baseline
+    assert compare_to_baseline(report, report) == []
+    faster = {'results': [dict(r, p50=r['p50'] / 10) for r in timed]}
+    assert len(compare_to_baseline(report, faster)) == len(timed)
+    
+    # A case that now fails regresses even though it has no latency to compare
+    failing = {'results': [{'stage': r['stage'], 'method': r.get('method'), 'family': r['family'],
+                            'num_qubits': r['num_qubits'], 'num_gates': r['num_gates'],
+                            'error': 'RuntimeError: boom'} for r in timed]}
+    regressions = compare_to_baseline(failing, report)
+    assert len(regressions) == len(timed)
+    assert all(r['error'] == 'RuntimeError: boom' for r in regressions)
+
+def test_pipeline_instrumentation():
+    """Test nested spans, counters and exports across the pipeline."""
+    tracer = Tracer()
+    circuit = QuantumCircuit(2)
+    circuit.h(0)
+    circuit.cx(0, 1)
+    circuit.cx(0, 1)
+    
+    optimized = CircuitOptimizer(tracer=tracer).optimize(circuit)
+    result = CircuitVerifier(tracer=tracer).verify(optimized, method='state_vector')
+    
+    trace = optimized.metadata['trace']
+    assert trace['name'] == 'optimize'
+    assert {child['name'] for child in trace['children']} >= {'pass_manager', 'qubit_mapping'}
+    assert result['trace']['children'][0]['name'] == 'statevector_simulation'
+    
+    snapshot = tracer.prometheus_text()
+    assert 'quantum_ai_optimizer_gates_removed_total{stage=' in snapshot
+    assert 'quantum_ai_span_seconds_count{span="verify"} 1' in snapshot
+    
+    buffer = io.StringIO()
+    tracer.export_jsonl(buffer)
+    records = [json.loads(line) for line in buffer.getvalue().splitlines()]
+    assert [r['name'] for r in records if r['type'] == 'span'] == ['optimize', 'verify']
+
+def test_disabled_instrumentation():
+    """Test that a disabled tracer records nothing and attaches no traces."""
+    tracer = Tracer(enabled=False)
+    assert tracer.span('noop') is NULL_SPAN
+    tracer.count('noop_total')
+    
+    circuit = QuantumCircuit(1)
+    circuit.h(0)
+    result = CircuitVerifier(tracer=tracer).verify(circuit, method='state_vector')
+    
+    assert 'trace' not in result
+    assert not tracer.counters and not tracer.spans
+
+def test_pipeline_service_batching_and_deadlines():
+    """Test micro-batched generation, deadlines and the HTTP endpoint."""
+    generator = StubCodeGenerator()
+    programs = [ghz_program(n) for n in (2, 3, 4)]
+    batch_sizes = []
+    generate_batch = generator.generate_batch
+    generator.generate_batch = lambda specs, **kwargs: (batch_sizes.append(len(specs))
+                                                        or generate_batch(specs, **kwargs))
+    
+    async def scenario():
+        async with PipelineService(generator, num_workers=2, batch_window=0.05) as service:
+            results = await asyncio.gather(*(service.submit(p) for p in programs))
+            
+            with pytest.raises(asyncio.TimeoutError):
+                await service.submit(programs[0], timeout=1e-6)
+            
+            server = await serve_http(service, port=0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            body = json.dumps({'specification': programs[0]}).encode()
+            writer.write(b"POST /generate HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+            response = await reader.read()
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return results, response
+    
+    results, response = asyncio.run(scenario())
+    
+    assert [r['num_qubits'] for r in results] == [2, 3, 4]
+    assert all(r['verification']['is_normalized'] for r in results)
+    # The three concurrent requests were coalesced into one model call
+    assert batch_sizes[0] == 3
+    
+    head, _, body = response.partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200")
+    assert json.loads(body)['num_qubits'] == 2
+
+def test_pipeline_service_failures():
+    """Test per-request parse failures, request validation and stopping with requests in flight."""
+    generator = StubCodeGenerator()
+    
+    async def post(port, body):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b"POST /generate HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body) + body)
+        response = await reader.read()
+        writer.close()
+        return response.split(b" ", 2)[1]
+    
+    async def scenario():
+        async with PipelineService(generator, num_workers=1, batch_window=0.05) as service:
+            results = await asyncio.gather(service.submit(ghz_program(2)),
+                                           service.submit("h(target=x)"),
+                                           return_exceptions=True)
+            
+            server = await serve_http(service, port=0)
+            port = server.sockets[0].getsockname()[1]
+            statuses = [await post(port, b"[]"),
+                        await post(port, json.dumps({'specification': 'h(target=0)',
+                                                     'timeout': 'soon'}).encode())]
+            server.close()
+            await server.wait_closed()
+        
+        # Stopping fails requests that are still being generated
+        generate_batch = generator.generate_batch
+        generator.generate_batch = lambda specs, **kwargs: (time.sleep(0.5)
+                                                            or generate_batch(specs, **kwargs))
+        service = PipelineService(generator, num_workers=1)
+        await service.start()
+        pending = asyncio.ensure_future(service.submit(ghz_program(2), timeout=30))
+        await asyncio.sleep(0.1)
+        await service.stop()
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(pending, 5)
+        # Stopping again, or stopping a service that never started, does nothing
+        await service.stop()
+        await PipelineService(generator).stop()
+        return results, statuses
+    
+    results, statuses = asyncio.run(scenario())
+    
+    # The malformed program fails alone and each request is counted once
+    assert results[0]['num_qubits'] == 2
+    assert isinstance(results[1], ValueError)
+    metrics = generator.get_metrics()
+    assert metrics['requests'] == 2
+    assert metrics['parse_successes'] == 1
+    assert statuses == [b"400", b"400"]
+
+def test_parameterized_generation_and_optimization():
+    """Test that named angles stay symbolic through generation and optimization."""
+    program = "\n".join([
+        "h(target=0)",
+        "phase(target=0, angle=theta)",
+        "phase(target=0, angle=phi)",
+        "cnot(control=0, target=1)",
+        "cnot(control=0, target=1)"
+    ])
+    circuit = StubCodeGenerator().generate(program)
+    assert {p.name for p in circuit.parameters} == {'theta', 'phi'}
+    
+    optimized = CircuitOptimizer().optimize(circuit)
+    
+    # The phases merge into one symbolic gate and the CNOT pair cancels
+    assert {p.name for p in optimized.parameters} == {'theta', 'phi'}
+    assert len(optimized.data) == 2
+    
+    # Opposite angles cancel, leaving no dead parameter to bind
+    theta = Parameter('theta')
+    cancelling = QuantumCircuit(1)
+    cancelling.h(0)
+    cancelling.rz(theta, 0)
+    cancelling.rz(-theta, 0)
+    assert not CircuitOptimizer().optimize(cancelling).parameters
+    
+    # Symbolic circuits are rejected by verify, including inside the service pipeline
+    with pytest.raises(ValueError, match='evaluate_parameter_sweep'):
+        CircuitVerifier().verify(circuit)
+    with pytest.raises(ValueError, match='evaluate_parameter_sweep'):
+        optimize_and_verify(circuit, 'state_vector')
+
+def test_optimize_numeric_phase_and_conditions():
+    """Test that numeric phases and classically conditioned gates survive optimization."""
+    circuit = StubCodeGenerator().generate(
+        "h(target=0)\nphase(target=0, angle=0.5)\ncnot(control=0, target=1)"
+    )
+    optimized = CircuitOptimizer().optimize(circuit)
+    assert Operator(optimized).equiv(Operator(circuit))
+    
+    flag = ClassicalRegister(1, 'flag')
+    conditional = QuantumCircuit(QuantumRegister(2, 'q'), flag)
+    conditional.h(0)
+    conditional.measure(0, 0)
+    conditional.x(1).c_if(flag, 1)
+    conditional.x(1).c_if(flag, 1)
+    optimized = CircuitOptimizer().optimize(conditional)
+    conditions = [inst.operation.condition for inst in optimized.data if inst.operation.name == 'x']
+    assert conditions == [(flag, 1), (flag, 1)]
+
+def test_parameter_sweep_matches_bound_circuits():
+    """Test the vectorized parameter sweep against per-point simulation."""
+    theta, phi = Parameter('theta'), Parameter('phi')
+    circuit = QuantumCircuit(2)
+    circuit.h(0)
+    circuit.rx(theta, 1)
+    circuit.cp(phi, 0, 1)
+    circuit.crz(theta + 2 * phi, 1, 0)
+    circuit.u(theta, phi, 0.3, 0)
+    
+    thetas = np.linspace(0, np.pi, 5)
+    phis = np.linspace(-1, 1, 3)
+    verifier = CircuitVerifier()
+    result = verifier.evaluate_parameter_sweep(
+        circuit, {'theta': thetas, phi: phis}, observable='ZX', grid=True, return_states=True
+    )
+    
+    assert result['verified']
+    assert result['shape'] == (3, 5)  # parameters are ordered by name
+    for i, p in enumerate(phis):
+        for j, t in enumerate(thetas):
+            expected = Statevector(circuit.assign_parameters({theta: t, phi: p}))
+            assert np.allclose(result['statevectors'][i, j], expected.data)
+    
+    with pytest.raises(ValueError):
+        verifier.evaluate_parameter_sweep(circuit, {'theta': thetas})
+
+def test_commutation_aware_scheduling():
+    """Test that layer scheduling moves gates across commuting CNOT wires."""
+    circuit = QuantumCircuit(2)
+    circuit.h(1)
+    circuit.cx(0, 1)
+    circuit.t(0)  # commutes with the CNOT control, so it can run alongside h(1)
+    
+    optimizer = CircuitOptimizer()
+    for method in ('asap', 'alap'):
+        scheduled, report = optimizer.schedule_layers(circuit, method)
+        assert report['depth_before'] == 3
+        assert report['depth_after'] == 2
+        assert Operator(scheduled).equiv(Operator(circuit))
+    
+    # Measurements and the gates conditioned on them keep their order
+    circuit = QuantumCircuit(2, 1)
+    circuit.h(0)
+    circuit.measure(0, 0)
+    circuit.x(1).c_if(circuit.clbits[0], 1)
+    scheduled, _ = optimizer.schedule_layers(circuit)
+    assert [inst.operation.name for inst in scheduled.data] == ['h', 'measure', 'x']
+    
+    optimized = optimizer.optimize(build_circuit('clifford_t', 4, 200))
+    assert optimized.metadata['schedule']['depth_after'] <= optimized.metadata['schedule']['depth_before']
+
+def test_binary_circuit_corpus(tmp_path):
+    """Test binary serialization and memory-mapped corpus access."""
+    theta = Parameter('theta')
+    phi = Parameter('phi')
+    circuit = QuantumCircuit(3, 2, global_phase=0.25)
+    circuit.h(0)
+    circuit.rx(theta, 1)
+    circuit.cp(theta + 2 * phi, 0, 2)
+    circuit.ccx(0, 1, 2)
+    circuit.measure([0, 1], [0, 1])
+    
+    decoded = decode_circuit(encode_circuit(circuit))
+    assert [inst.operation.name for inst in decoded.data] == [inst.operation.name for inst in circuit.data]
+    assert decoded.global_phase == circuit.global_phase
+    
+    # Decoded parameters are new objects with the same names
+    values = {'theta': 0.3, 'phi': 1.1}
+    bound = [
+        c.remove_final_measurements(inplace=False).assign_parameters(
+            {p: values[p.name] for p in c.parameters}
+        )
+        for c in (circuit, decoded)
+    ]
+    assert Operator(bound[0]).equiv(Operator(bound[1]))
+    
+    # Operand counts wider than a byte and register layouts survive the round trip
+    wide = QuantumCircuit(300)
+    wide.h(0)
+    wide.cx(0, 299)
+    wide.measure_all()
+    assert decode_circuit(encode_circuit(wide)) == wide
+    registers = QuantumCircuit(QuantumRegister(2, 'a'), ClassicalRegister(1, 'x'),
+                               ClassicalRegister(1, 'y'))
+    registers.h(0)
+    registers.measure([0, 1], [0, 1])
+    assert decode_circuit(encode_circuit(registers)) == registers
+    
+    # Conditional instructions are not part of the format
+    conditional = QuantumCircuit(1, 1)
+    conditional.x(0).c_if(conditional.clbits[0], 1)
+    with pytest.raises(ValueError):
+        encode_circuit(conditional)
+    
+    circuits = [build_circuit('clifford_t', 4, 50, seed=seed) for seed in range(10)]
+    path = str(tmp_path / 'circuits.corpus')
+    write_corpus(path, circuits)
+    
+    with CircuitCorpus(path) as corpus:
+        assert len(corpus) == 10
+        assert corpus[7] == circuits[7]
+        assert corpus.record(3).gate_counts() == dict(circuits[3].count_ops())
+        batches = list(corpus.iter_batches(4))
+        assert [len(batch) for batch in batches] == [4, 4, 2]
+        optimized = CircuitOptimizer().optimize_batch(batches[0])
+        results = CircuitVerifier().verify_batch(optimized)
+        assert all(result['is_normalized'] for result in results)
+        record = corpus.record(7)
+    # Records taken before closing stay readable
+    assert record.to_circuit() == circuits[7]
+    with pytest.raises(ValueError):
+        corpus.record(0)
+    
+    assert map_corpus(path, len, indices=[2, 5], processes=1) == [len(circuits[2]), len(circuits[5])]